@@ -4,8 +4,13 @@ from typing import Callable
 
 from agents.browser_agent import BrowserAutomationAgent
 from agents.reasoning_agent import ClinicalReasoningAgent
-from agents.retrieval_agent import PayerPolicyRetrievalAgent
-from agents.types import PriorAuthWorkflowResult, WorkflowTraceStep
+from agents.retrieval_agent import PayerPolicyRetrievalAgent, SpeculativePolicyLookup
+from agents.types import (
+    NecessityDecision,
+    PolicyMatch,
+    PriorAuthWorkflowResult,
+    WorkflowTraceStep,
+)
 from agents.voice_agent import VoiceIntakeAgent
 
 
@@ -67,8 +72,36 @@ class PriorAuthOrchestrator:
             f"Member ID {extracted.member_id} is present.",
         )
 
+        def fetch_policy(procedure_code: str) -> PolicyMatch:
+            return self.retrieval_agent.retrieve(
+                payer_name=extracted.payer_name,
+                member_id=extracted.member_id,
+                procedure_code=procedure_code,
+                requested_service=extracted.requested_service,
+            )
+
+        # Retrieval only needs the CPT code, so it starts on the predicted code
+        # and overlaps the coding call.
+        policy_lookup = SpeculativePolicyLookup(
+            fetch_policy, self.reasoning_agent.predict_procedure_code(extracted)
+        )
+
+        # With Nova coding and justification, one request returns both, drafted
+        # against the speculative policy; it is reused if coding confirms it.
+        # Only a policy that is already in hand is used: waiting for it here
+        # would serialize retrieval ahead of coding.
+        speculative_policy = (
+            policy_lookup.speculative() if self.reasoning_agent.combines_nova_calls else None
+        )
+        necessity: NecessityDecision | None = None
+
         emit("Clinical Coding", "in_progress", "Mapping ICD-10 and CPT codes.")
-        coding = self.reasoning_agent.map_codes(extracted)
+        if speculative_policy is not None:
+            coding, necessity = self.reasoning_agent.generate_codes_and_justification(
+                extracted, speculative_policy
+            )
+        else:
+            coding = self.reasoning_agent.map_codes(extracted)
         result.coding = coding
         emit(
             "Clinical Coding",
@@ -77,12 +110,7 @@ class PriorAuthOrchestrator:
         )
 
         emit("Knowledge Retrieval", "in_progress", "Fetching payer policy criteria.")
-        policy = self.retrieval_agent.retrieve(
-            payer_name=extracted.payer_name,
-            member_id=extracted.member_id,
-            procedure_code=coding.procedure_code,
-            requested_service=extracted.requested_service,
-        )
+        policy = policy_lookup.result(coding.procedure_code)
         result.policy = policy
         emit(
             "Knowledge Retrieval",
@@ -91,7 +119,8 @@ class PriorAuthOrchestrator:
         )
 
         emit("Medical Necessity Analysis", "in_progress", "Evaluating policy criteria.")
-        necessity = self.reasoning_agent.evaluate_medical_necessity(extracted, coding, policy)
+        if necessity is None or policy is not speculative_policy:
+            necessity = self.reasoning_agent.evaluate_medical_necessity(extracted, coding, policy)
         result.necessity = necessity
         emit(
             "Medical Necessity Analysis",
@@ -4,7 +4,7 @@ import json
 import logging
 import os
 import re
-from typing import Any, Protocol, cast
+from typing import Any, Callable, Protocol, cast
 
 from agents.types import (
     CodingResult,
@@ -12,18 +12,53 @@ from agents.types import (
     NecessityDecision,
     PolicyMatch,
 )
-from utils.bedrock_client import get_bedrock_client
+from utils.bedrock_cache import cached_nova_call
+from utils.bedrock_client import get_bedrock_client, system_blocks
 
 ICD10_PATTERN = re.compile(r"^[A-TV-Z][0-9][0-9A-Z](?:\.[0-9A-Z]{1,4})?$")
 CPT_PATTERN = re.compile(r"^\d{5}$")
 logger = logging.getLogger(__name__)
 
+# System prompts are static, so their Converse blocks are built once.
+CODING_SYSTEM_PROMPT = (
+    "You are a medical coding assistant for prior authorization workflows. "
+    "Return only JSON with keys diagnosis_code, procedure_code, confidence, rationale. "
+    "Use a single ICD-10-CM diagnosis code and a single CPT procedure code. "
+    "Confidence must be a float between 0 and 1."
+)
+JUSTIFICATION_SYSTEM_PROMPT = (
+    "You draft prior authorization medical necessity narratives for U.S. providers. "
+    "Write concise payer-ready clinical prose in one paragraph. "
+    "Do not mention AI, model confidence, or uncertainty language."
+)
+COMBINED_SYSTEM_PROMPT = (
+    "You are a medical coding assistant and prior authorization writer for U.S. providers. "
+    'Return only JSON of the form {"coding": {"diagnosis_code", "procedure_code", '
+    '"confidence", "rationale"}, "justification": "..."}. '
+    "Use a single ICD-10-CM diagnosis code and a single CPT procedure code; "
+    "confidence must be a float between 0 and 1. "
+    "The justification is one paragraph of concise payer-ready clinical prose that cites "
+    "those codes and does not mention AI, model confidence, or uncertainty language."
+)
+_CODING_SYSTEM = system_blocks(CODING_SYSTEM_PROMPT)
+_JUSTIFICATION_SYSTEM = system_blocks(JUSTIFICATION_SYSTEM_PROMPT)
+_COMBINED_SYSTEM = system_blocks(COMBINED_SYSTEM_PROMPT)
+# Below this heuristic confidence the CPT guess is too often wrong to be worth
+# a speculative policy retrieval.
+SPECULATION_MIN_CONFIDENCE = 0.7
+
 
 class BedrockRuntimeClient(Protocol):
     def converse(self, **kwargs: Any) -> dict[str, Any]:
         ...
 
 
+@cached_nova_call
+def _cached_converse(client: BedrockRuntimeClient, **request: Any) -> dict[str, Any]:
+    # Coding calls run at temperature 0, so identical requests can share answers.
+    return client.converse(**request)
+
+
 class ClinicalReasoningAgent:
     """Maps clinical context to coding and medical necessity decisions."""
 
@@ -78,30 +113,88 @@ class ClinicalReasoningAgent:
         heuristic_coding = self._map_codes_heuristic(extracted)
         return self._apply_coding_guardrails(extracted, heuristic_coding)
 
+    def predict_procedure_code(self, extracted: ExtractedClinicalData) -> str | None:
+        """
+        Model-free CPT guess, used to start policy retrieval before coding finishes.
+        Returns None when the heuristic is not confident enough to speculate on.
+        """
+        heuristic = self._map_codes_heuristic(extracted)
+        prediction = self._apply_coding_guardrails(extracted, heuristic)
+        if prediction.confidence < SPECULATION_MIN_CONFIDENCE:
+            return None
+        return prediction.procedure_code
+
+    @property
+    def combines_nova_calls(self) -> bool:
+        """True when coding and justification both use Nova and can share one request."""
+        return self.use_model and self.use_model_justification
+
+    def generate_codes_and_justification(
+        self,
+        extracted: ExtractedClinicalData,
+        policy: PolicyMatch,
+    ) -> tuple[CodingResult, NecessityDecision]:
+        """
+        Coding plus necessity decision with a single Nova round trip.
+
+        Criteria are assessed locally first (they do not depend on the codes),
+        so one request can return both the codes and the narrative. If the
+        guardrails change the model's codes, the narrative would cite the wrong
+        ones, so it is regenerated through the standard justification path.
+        Without both model toggles, or when the combined call fails, this is
+        map_codes followed by evaluate_medical_necessity.
+        """
+        assessment = self._assess_policy(extracted, policy)
+        if not self.combines_nova_calls:
+            coding = self.map_codes(extracted)
+            return coding, self._necessity_decision(extracted, coding, policy, assessment)
+
+        try:
+            model_coding, justification, extended_thinking_used = (
+                self._codes_and_justification_with_nova(extracted, policy, assessment)
+            )
+        except Exception as exc:
+            if self.require_model_success:
+                raise RuntimeError(f"Nova combined call failed: {exc}") from exc
+            logger.warning("Combined Nova call fell back to separate calls: %s", exc)
+            coding = self.map_codes(extracted)
+            return coding, self._necessity_decision(extracted, coding, policy, assessment)
+
+        coding = self._apply_coding_guardrails(extracted, model_coding)
+        if coding is not model_coding:
+            return coding, self._necessity_decision(extracted, coding, policy, assessment)
+        return coding, self._necessity_decision(
+            extracted,
+            coding,
+            policy,
+            assessment,
+            justification=(justification, extended_thinking_used),
+        )
+
     def evaluate_medical_necessity(
         self,
         extracted: ExtractedClinicalData,
         coding: CodingResult,
         policy: PolicyMatch,
     ) -> NecessityDecision:
-        satisfied: list[str] = []
-        missing: list[str] = []
-
-        for criterion in policy.criteria:
-            criterion_id = criterion.get("id", "")
-            criterion_description = criterion.get("description", criterion_id)
-            if self._criterion_met(criterion_id, extracted):
-                satisfied.append(criterion_description)
-            else:
-                missing.append(criterion_description)
+        return self._necessity_decision(
+            extracted, coding, policy, self._assess_policy(extracted, policy)
+        )
 
-        meets_criteria = len(satisfied) >= policy.minimum_criteria
-        available_documents = self._infer_documents(extracted)
-        missing_documents = [
-            document
-            for document in policy.required_documents
-            if document not in available_documents
-        ]
+    def _necessity_decision(
+        self,
+        extracted: ExtractedClinicalData,
+        coding: CodingResult,
+        policy: PolicyMatch,
+        assessment: tuple[list[str], list[str], bool, list[str]],
+        justification: tuple[str, bool] | None = None,
+    ) -> NecessityDecision:
+        """
+        Builds the decision from an _assess_policy result. ``justification`` is
+        an already generated (text, extended_thinking_used) pair; without one
+        the justification is generated here.
+        """
+        satisfied, missing, meets_criteria, missing_documents = assessment
         denial_risk_score = self._calculate_denial_risk(
             meets_criteria=meets_criteria,
             missing_criteria_count=len(missing),
@@ -109,16 +202,18 @@ class ClinicalReasoningAgent:
             coding_confidence=coding.confidence,
             coding_source=coding.source,
         )
-        justification, extended_thinking_used = self._build_justification_with_resilience(
-            extracted=extracted,
-            coding=coding,
-            policy=policy,
-            meets_criteria=meets_criteria,
-            satisfied=satisfied,
-            missing=missing,
-            missing_documents=missing_documents,
-            denial_risk_score=denial_risk_score,
-        )
+        if justification is None:
+            justification = self._build_justification_with_resilience(
+                extracted=extracted,
+                coding=coding,
+                policy=policy,
+                meets_criteria=meets_criteria,
+                satisfied=satisfied,
+                missing=missing,
+                missing_documents=missing_documents,
+                denial_risk_score=denial_risk_score,
+            )
+        justification_text, extended_thinking_used = justification
 
         return NecessityDecision(
             meets_criteria=meets_criteria,
@@ -126,10 +221,38 @@ class ClinicalReasoningAgent:
             missing_criteria=missing,
             missing_documents=missing_documents,
             denial_risk_score=denial_risk_score,
-            justification=justification,
+            justification=justification_text,
             extended_thinking_used=extended_thinking_used,
         )
 
+    def _assess_policy(
+        self,
+        extracted: ExtractedClinicalData,
+        policy: PolicyMatch,
+    ) -> tuple[list[str], list[str], bool, list[str]]:
+        """Returns (satisfied, missing, meets_criteria, missing_documents) for the policy."""
+        satisfied: list[str] = []
+        missing: list[str] = []
+
+        # Built once per evaluation rather than once per criterion.
+        signal = self._criterion_signal(extracted)
+        for criterion in policy.criteria:
+            criterion_id = criterion.get("id", "")
+            criterion_description = criterion.get("description", criterion_id)
+            if self._criterion_met(criterion_id, extracted, signal):
+                satisfied.append(criterion_description)
+            else:
+                missing.append(criterion_description)
+
+        meets_criteria = len(satisfied) >= policy.minimum_criteria
+        available_documents = self._infer_documents(extracted)
+        missing_documents = [
+            document
+            for document in policy.required_documents
+            if document not in available_documents
+        ]
+        return satisfied, missing, meets_criteria, missing_documents
+
     @staticmethod
     def build_form_payload(
         extracted: ExtractedClinicalData,
@@ -159,12 +282,6 @@ class ClinicalReasoningAgent:
         if runtime_client is None:
             raise RuntimeError("Bedrock runtime client failed to initialize.")
 
-        system_prompt = (
-            "You are a medical coding assistant for prior authorization workflows. "
-            "Return only JSON with keys diagnosis_code, procedure_code, confidence, rationale. "
-            "Use a single ICD-10-CM diagnosis code and a single CPT procedure code. "
-            "Confidence must be a float between 0 and 1."
-        )
         user_prompt = (
             "Map the following clinical request to one ICD-10-CM code and one CPT code.\n"
             f"Patient findings: {', '.join(extracted.clinical_findings) or 'Not specified'}\n"
@@ -173,9 +290,10 @@ class ClinicalReasoningAgent:
             "Respond with JSON only."
         )
 
-        response = runtime_client.converse(
+        response = _cached_converse(
+            runtime_client,
             modelId=self.model_id,
-            system=[{"text": system_prompt}],
+            system=_CODING_SYSTEM,
             messages=[{"role": "user", "content": [{"text": user_prompt}]}],
             inferenceConfig={"maxTokens": 240, "temperature": 0.0},
         )
@@ -183,8 +301,58 @@ class ClinicalReasoningAgent:
         content = response.get("output", {}).get("message", {}).get("content", [])
         text_parts = [part.get("text", "") for part in content if isinstance(part, dict)]
         raw_text = "\n".join(part for part in text_parts if part).strip()
-        payload = self._parse_model_json(raw_text)
+        return self._coding_from_payload(self._parse_model_json(raw_text))
 
+    def _codes_and_justification_with_nova(
+        self,
+        extracted: ExtractedClinicalData,
+        policy: PolicyMatch,
+        assessment: tuple[list[str], list[str], bool, list[str]],
+    ) -> tuple[CodingResult, str, bool]:
+        self._ensure_runtime_client()
+        runtime_client = self._runtime_client
+        if runtime_client is None:
+            raise RuntimeError("Bedrock runtime client failed to initialize.")
+        satisfied, missing, meets_criteria, missing_documents = assessment
+        status = "meets" if meets_criteria else "partially meets"
+        user_prompt = (
+            "Map the clinical request to one ICD-10-CM code and one CPT code, then draft the "
+            "medical necessity justification for them.\n"
+            f"Policy: {policy.title}\n"
+            f"Case status: {status} policy criteria\n"
+            f"Patient: {extracted.patient_name or 'Unknown patient'}\n"
+            f"DOB: {extracted.date_of_birth or 'Unknown'}\n"
+            f"Requested service: {extracted.requested_service}\n"
+            f"Patient findings: {', '.join(extracted.clinical_findings) or 'Not specified'}\n"
+            f"Clinical note: {extracted.transcript}\n"
+            f"Satisfied criteria: {'; '.join(satisfied) or 'None'}\n"
+            f"Missing criteria: {'; '.join(missing) or 'None'}\n"
+            f"Missing documents: {'; '.join(missing_documents) or 'None'}\n"
+            "Respond with JSON only."
+        )
+
+        # The justification model writes the narrative, so it also does the coding here.
+        # Like the standalone narrative, the request is uncached and sampled at 0.2.
+        response, extended_thinking_fired = self._converse_with_optional_thinking(
+            runtime_client.converse,
+            {
+                "modelId": self.justification_model_id,
+                "system": _COMBINED_SYSTEM,
+                "messages": [{"role": "user", "content": [{"text": user_prompt}]}],
+                "inferenceConfig": {"maxTokens": 660, "temperature": 0.2},
+            },
+        )
+
+        payload = self._parse_model_json(self._extract_text_from_converse(response))
+        coding_payload = payload.get("coding")
+        if not isinstance(coding_payload, dict):
+            raise ValueError("Combined model output is missing the coding object.")
+        justification = str(payload.get("justification", "")).strip()
+        if not justification:
+            raise ValueError("Combined model output is missing the justification.")
+        return self._coding_from_payload(coding_payload), justification, extended_thinking_fired
+
+    def _coding_from_payload(self, payload: dict[str, Any]) -> CodingResult:
         diagnosis_code = self._normalize_icd(payload.get("diagnosis_code", ""))
         procedure_code = self._normalize_cpt(payload.get("procedure_code", ""))
         confidence = self._normalize_confidence(payload.get("confidence", 0.75))
@@ -272,11 +440,6 @@ class ClinicalReasoningAgent:
         missing_doc_text = "; ".join(missing_documents) if missing_documents else "None"
         findings = ", ".join(extracted.clinical_findings) if extracted.clinical_findings else "None"
 
-        system_prompt = (
-            "You draft prior authorization medical necessity narratives for U.S. providers. "
-            "Write concise payer-ready clinical prose in one paragraph. "
-            "Do not mention AI, model confidence, or uncertainty language."
-        )
         user_prompt = (
             "Draft the medical necessity justification.\n"
             f"Policy: {policy.title}\n"
@@ -297,13 +460,26 @@ class ClinicalReasoningAgent:
 
         request_payload: dict[str, Any] = {
             "modelId": self.justification_model_id,
-            "system": [{"text": system_prompt}],
+            "system": _JUSTIFICATION_SYSTEM,
             "messages": [{"role": "user", "content": [{"text": user_prompt}]}],
             "inferenceConfig": {"maxTokens": 420, "temperature": 0.2},
         }
 
-        response = None
-        extended_thinking_fired = False
+        response, extended_thinking_fired = self._converse_with_optional_thinking(
+            runtime_client.converse, request_payload
+        )
+
+        text = self._extract_text_from_converse(response)
+        if not text:
+            raise ValueError("Model returned empty justification text.")
+        return text, extended_thinking_fired
+
+    def _converse_with_optional_thinking(
+        self,
+        converse: Callable[..., dict[str, Any]],
+        request_payload: dict[str, Any],
+    ) -> tuple[dict[str, Any], bool]:
+        """Returns (response, extended_thinking_fired); falls back to standard inference."""
         if self.prefer_extended_thinking:
             extended_payload = dict(request_payload)
             extended_payload["additionalModelRequestFields"] = {
@@ -313,22 +489,13 @@ class ClinicalReasoningAgent:
                 }
             }
             try:
-                response = runtime_client.converse(**extended_payload)
-                extended_thinking_fired = True
+                return converse(**extended_payload), True
             except Exception as exc:
                 logger.warning(
                     "Extended thinking fell back to standard inference: %s",
                     exc,
                 )
-                response = None
-
-        if response is None:
-            response = runtime_client.converse(**request_payload)
-
-        text = self._extract_text_from_converse(response)
-        if not text:
-            raise ValueError("Model returned empty justification text.")
-        return text, extended_thinking_fired
+        return converse(**request_payload), False
 
     @staticmethod
     def _extract_text_from_converse(response: dict[str, Any]) -> str:
@@ -516,11 +683,13 @@ class ClinicalReasoningAgent:
         return set(), None
 
     @staticmethod
-    def _criterion_met(criterion_id: str, extracted: ExtractedClinicalData) -> bool:
+    def _criterion_signal(extracted: ExtractedClinicalData) -> str:
         transcript = extracted.transcript.lower()
         findings = " ".join(extracted.clinical_findings).lower()
-        signal = f"{transcript} {findings}"
+        return f"{transcript} {findings}"
 
+    @staticmethod
+    def _criterion_met(criterion_id: str, extracted: ExtractedClinicalData, signal: str) -> bool:
         if criterion_id == "conservative_therapy_6w":
             return (extracted.conservative_therapy_weeks or 0) >= 6
         if criterion_id in {"radicular_symptoms", "red_flag_or_neuro_deficit"}:
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import contextvars
 import json
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Protocol, cast
+from typing import Any, Callable, Protocol, cast
 
 from agents.types import PolicyMatch
-from knowledge_base.setup_kb import DEFAULT_POLICIES, DEFAULT_POLICIES_PATH
+from knowledge_base.setup_kb import (
+    DEFAULT_POLICIES,
+    DEFAULT_POLICIES_PATH,
+    build_policy_index,
+    policy_index_path,
+)
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - falls back to one substring test per keyword.
+    ahocorasick = None  # type: ignore[assignment]
 
 
 class BedrockAgentRuntimeClient(Protocol):
@@ -15,6 +28,107 @@ class BedrockAgentRuntimeClient(Protocol):
         ...
 
 
+# Shared by SpeculativePolicyLookup; retrieval is I/O bound (KB call or file read).
+# A run holds at most one speculative lookup, so size this to the number of
+# concurrent runs. Created on first use so importing the agents starts no pool.
+PA_SPECULATION_WORKERS = int(os.getenv("PA_SPECULATION_WORKERS", "8"))
+_speculation_pool: ThreadPoolExecutor | None = None
+_speculation_pool_lock = threading.Lock()
+
+
+def _speculation_executor() -> ThreadPoolExecutor:
+    global _speculation_pool
+    with _speculation_pool_lock:
+        if _speculation_pool is None:
+            _speculation_pool = ThreadPoolExecutor(
+                max_workers=PA_SPECULATION_WORKERS, thread_name_prefix="pa-policy"
+            )
+        return _speculation_pool
+
+
+class SpeculativePolicyLookup:
+    """
+    Starts policy retrieval for a predicted CPT code while clinical coding is
+    still running. result() reuses that retrieval when coding lands on the
+    predicted code and otherwise retrieves again, so the policy is always the
+    one a sequential lookup would have selected. A mispredicted lookup that has
+    already started cannot be stopped, so callers pass None instead of a
+    low-confidence guess and retrieval then simply runs in result(). The
+    speculative fetch runs in a copy of the caller's context, so its OTel
+    spans stay in the run's trace.
+    """
+
+    __slots__ = ("_fetch", "_predicted_code", "_future")
+
+    def __init__(
+        self, fetch: Callable[[str], PolicyMatch], predicted_code: str | None
+    ) -> None:
+        self._fetch = fetch
+        self._predicted_code = predicted_code
+        self._future = (
+            _speculation_executor().submit(
+                contextvars.copy_context().run, fetch, predicted_code
+            )
+            if predicted_code is not None
+            else None
+        )
+
+    def speculative(self) -> PolicyMatch | None:
+        """
+        The policy for the predicted code if its retrieval has already finished,
+        else None. Never waits; a failed retrieval surfaces from result().
+        """
+        future = self._future
+        if future is None or not future.done() or future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None
+        return future.result()
+
+    def result(self, procedure_code: str) -> PolicyMatch:
+        if self._future is not None:
+            if procedure_code == self._predicted_code:
+                return self._future.result()
+            self._future.cancel()
+        return self._fetch(procedure_code)
+
+
+class _PolicyIndex:
+    """
+    Frozen lookup tables over the local policy store (see build_policy_index),
+    plus each policy's lowercased payer name and the policy dicts by ID, in
+    store order, so a query never re-walks or re-normalizes the store.
+    """
+
+    __slots__ = ("by_prefix", "by_cpt", "keywords", "payers", "by_id", "_automaton")
+
+    def __init__(
+        self, raw: dict[str, dict[str, list[str]]], policies: list[dict[str, Any]]
+    ) -> None:
+        self.payers = tuple(
+            (policy["policy_id"], str(policy.get("payer_name", "")).lower()) for policy in policies
+        )
+        self.by_id: dict[str, dict[str, Any]] = {}
+        for policy in policies:
+            self.by_id.setdefault(policy["policy_id"], policy)
+        self.by_prefix = {key: tuple(ids) for key, ids in raw.get("by_prefix", {}).items()}
+        self.by_cpt = {key: tuple(ids) for key, ids in raw.get("by_cpt", {}).items()}
+        self.keywords = {key: tuple(ids) for key, ids in raw.get("keywords", {}).items()}
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def matched_keywords(self, text: str) -> frozenset[str]:
+        """Keywords occurring anywhere in text; a single automaton pass when available."""
+        if self._automaton is not None:
+            return frozenset(keyword for _, keyword in self._automaton.iter(text))
+        return frozenset(keyword for keyword in self.keywords if keyword in text)
+
+
 class PayerPolicyRetrievalAgent:
     """
     Dual-mode policy retrieval agent.
@@ -32,6 +146,7 @@ class PayerPolicyRetrievalAgent:
     ) -> None:
         self.policy_path = policy_path or DEFAULT_POLICIES_PATH
         self._policies: list[dict[str, Any]] | None = None
+        self._policy_index: _PolicyIndex | None = None
         self.kb_id = kb_id if kb_id is not None else self._resolve_kb_id()
         self.retrieval_source = "bedrock_kb" if self.kb_id else "local"
         self._kb_client: BedrockAgentRuntimeClient | None = kb_client
@@ -66,6 +181,29 @@ class PayerPolicyRetrievalAgent:
             self._policies = self._load_policies()
         return self._policies
 
+    def _load_policy_index(self) -> dict[str, dict[str, list[str]]]:
+        # Trust the companion index only when it is at least as new as the store it describes.
+        index_path = policy_index_path(self.policy_path)
+        try:
+            if index_path.stat().st_mtime >= self.policy_path.stat().st_mtime:
+                raw = json.loads(index_path.read_text(encoding="utf-8"))
+                if isinstance(raw, dict):
+                    return raw
+        except (OSError, json.JSONDecodeError):
+            pass
+        return build_policy_index(self._get_local_policies())
+
+    def _get_policy_index(self) -> _PolicyIndex:
+        if self._policy_index is None:
+            self._policy_index = _PolicyIndex(
+                self._load_policy_index(), self._get_local_policies()
+            )
+        return self._policy_index
+
+    def warm_up(self) -> None:
+        """Load the local policy index (and keyword automaton) ahead of the first retrieval."""
+        self._get_policy_index()
+
     def retrieve(
         self,
         payer_name: str,
@@ -391,21 +529,17 @@ class PayerPolicyRetrievalAgent:
         member_prefix = member_id.split("-", 1)[0].upper() if member_id else ""
         payer_name_lower = payer_name.lower()
 
-        best_policy = None
-        best_score = -1
-        for policy in self._get_local_policies():
-            score = self._score_policy(
-                policy=policy,
-                payer_name_lower=payer_name_lower,
-                member_prefix=member_prefix,
-                procedure_code=procedure_code,
-                service=service,
-            )
-            if score > best_score:
-                best_policy = policy
-                best_score = score
+        index = self._get_policy_index()
+        scores = self._score_policies(
+            index=index,
+            payer_name_lower=payer_name_lower,
+            member_prefix=member_prefix,
+            procedure_code=procedure_code,
+            service=service,
+        )
 
-        selected = best_policy if best_policy is not None else DEFAULT_POLICIES[-1]
+        # max() keeps the first of equal scores, i.e. the earliest policy in the store.
+        selected = index.by_id[max(scores, key=scores.__getitem__)] if scores else DEFAULT_POLICIES[-1]
         return self._policy_dict_to_match(selected)
 
     # ------------------------------------------------------------------
@@ -425,29 +559,27 @@ class PayerPolicyRetrievalAgent:
         )
 
     @staticmethod
-    def _score_policy(
-        policy: dict[str, Any],
+    def _score_policies(
+        index: _PolicyIndex,
         payer_name_lower: str,
         member_prefix: str,
         procedure_code: str,
         service: str,
-    ) -> int:
-        score = 0
-
-        policy_payer = str(policy.get("payer_name", "")).lower()
-        if policy_payer and policy_payer in payer_name_lower:
-            score += 7
-
-        prefixes = [prefix.upper() for prefix in policy.get("member_prefixes", [])]
-        if member_prefix and member_prefix in prefixes:
-            score += 8
-
-        codes = policy.get("procedure_codes", [])
-        if procedure_code and procedure_code in codes:
-            score += 4
-
-        for keyword in policy.get("service_keywords", []):
-            if keyword.lower() in service:
-                score += 2
-
-        return score
+    ) -> dict[str, int]:
+        scores: dict[str, int] = {}
+        for policy_id, policy_payer in index.payers:
+            scores[policy_id] = 7 if policy_payer and policy_payer in payer_name_lower else 0
+
+        def add(policy_ids: tuple[str, ...], points: int) -> None:
+            for policy_id in policy_ids:
+                if policy_id in scores:
+                    scores[policy_id] += points
+
+        if member_prefix:
+            add(index.by_prefix.get(member_prefix, ()), 8)
+        if procedure_code:
+            add(index.by_cpt.get(procedure_code, ()), 4)
+        for keyword in index.matched_keywords(service):
+            add(index.keywords[keyword], 2)
+
+        return scores
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import threading
+from dataclasses import replace
 from typing import Any, Callable, TypeVar, cast
 
 from opentelemetry import trace
 
 from agents.browser_agent import BrowserAutomationAgent
 from agents.reasoning_agent import ClinicalReasoningAgent
-from agents.retrieval_agent import PayerPolicyRetrievalAgent
+from agents.retrieval_agent import PayerPolicyRetrievalAgent, SpeculativePolicyLookup
 from agents.types import (
     CodingResult,
     ExtractedClinicalData,
@@ -34,6 +37,9 @@ except Exception as exc:  # pragma: no cover - exercised by runtime fallback.
 
 _ToolFunc = TypeVar("_ToolFunc", bound=Callable[..., Any])
 
+# Upper bound on remembered terminal eligibility verdicts per orchestrator.
+_ELIGIBILITY_CACHE_MAX_ENTRIES = 10_000
+
 
 def _decorate_tool(func: _ToolFunc) -> _ToolFunc:
     if _strands_tool is None:
@@ -60,19 +66,93 @@ class _WorkflowTools:
         self.reasoning_agent = reasoning_agent
         self.browser_agent = browser_agent
 
+    # Direct paths return domain objects for in-process stage wiring, skipping
+    # the JSON round-trip that Strands tool results require.
+
+    def _direct_extract_clinical_data(self, transcript: str) -> ExtractedClinicalData:
+        return self.voice_agent.ingest(transcript)
+
+    def _direct_map_clinical_codes(self, extracted: ExtractedClinicalData) -> CodingResult:
+        return self.reasoning_agent.map_codes(extracted)
+
+    def _direct_map_codes_and_justify(
+        self,
+        extracted: ExtractedClinicalData,
+        policy: PolicyMatch,
+    ) -> tuple[CodingResult, NecessityDecision]:
+        return self.reasoning_agent.generate_codes_and_justification(extracted, policy)
+
+    def _direct_retrieve_payer_policy(
+        self,
+        payer_name: str,
+        member_id: str,
+        procedure_code: str,
+        requested_service: str,
+    ) -> PolicyMatch:
+        return self.retrieval_agent.retrieve(
+            payer_name=payer_name,
+            member_id=member_id,
+            procedure_code=procedure_code,
+            requested_service=requested_service,
+        )
+
+    def _direct_evaluate_necessity(
+        self,
+        extracted: ExtractedClinicalData,
+        coding: CodingResult,
+        policy: PolicyMatch,
+    ) -> NecessityDecision:
+        return self.reasoning_agent.evaluate_medical_necessity(extracted, coding, policy)
+
+    def _direct_build_submission_payload(
+        self,
+        extracted: ExtractedClinicalData,
+        coding: CodingResult,
+        necessity: NecessityDecision,
+        policy: PolicyMatch,
+    ) -> dict[str, str]:
+        return self.reasoning_agent.build_form_payload(extracted, coding, necessity, policy)
+
+    def _direct_generate_review_snapshot(self, payload: dict[str, str]) -> str:
+        return self.browser_agent.generate_review_snapshot(payload)
+
+    def _direct_submit_form(
+        self,
+        payload: dict[str, str],
+        approved: bool,
+        review_snapshot: str,
+    ) -> SubmissionResult:
+        return self.browser_agent.submit(
+            payload=payload,
+            approved=approved,
+            review_snapshot=review_snapshot,
+        )
+
     @_decorate_tool
     def extract_clinical_data(self, transcript: str) -> str:
         """Extract structured patient and clinical details from transcript text."""
-        extracted = self.voice_agent.ingest(transcript)
+        extracted = self._direct_extract_clinical_data(transcript)
         return json.dumps(extracted.to_dict())
 
     @_decorate_tool
     def map_clinical_codes(self, extracted_data: dict[str, Any]) -> str:
         """Map ICD-10 and CPT codes from extracted clinical context."""
         extracted = ExtractedClinicalData(**extracted_data)
-        coding = self.reasoning_agent.map_codes(extracted)
+        coding = self._direct_map_clinical_codes(extracted)
         return json.dumps(coding.to_dict())
 
+    @_decorate_tool
+    def map_codes_and_justify(
+        self,
+        extracted_data: dict[str, Any],
+        policy_data: dict[str, Any],
+    ) -> str:
+        """Map ICD-10 and CPT codes and draft the necessity justification in one model call."""
+        extracted = ExtractedClinicalData(**extracted_data)
+        policy = PolicyMatch(**policy_data)
+        coding, necessity = self._direct_map_codes_and_justify(extracted, policy)
+        return json.dumps({"coding": coding.to_dict(), "necessity": necessity.to_dict()})
+
     @_decorate_tool
     def retrieve_payer_policy(
         self,
@@ -82,7 +162,7 @@ class _WorkflowTools:
         requested_service: str,
     ) -> str:
         """Retrieve payer policy criteria using KB retrieval with local fallback."""
-        policy = self.retrieval_agent.retrieve(
+        policy = self._direct_retrieve_payer_policy(
             payer_name=payer_name,
             member_id=member_id,
             procedure_code=procedure_code,
@@ -101,7 +181,7 @@ class _WorkflowTools:
         extracted = ExtractedClinicalData(**extracted_data)
         coding = CodingResult(**coding_data)
         policy = PolicyMatch(**policy_data)
-        necessity = self.reasoning_agent.evaluate_medical_necessity(extracted, coding, policy)
+        necessity = self._direct_evaluate_necessity(extracted, coding, policy)
         return json.dumps(necessity.to_dict())
 
     @_decorate_tool
@@ -117,13 +197,13 @@ class _WorkflowTools:
         coding = CodingResult(**coding_data)
         necessity = NecessityDecision(**necessity_data)
         policy = PolicyMatch(**policy_data)
-        payload = self.reasoning_agent.build_form_payload(extracted, coding, necessity, policy)
+        payload = self._direct_build_submission_payload(extracted, coding, necessity, policy)
         return json.dumps(payload)
 
     @_decorate_tool
     def generate_review_snapshot(self, payload: dict[str, str]) -> str:
         """Generate human-review summary for HITL approval."""
-        snapshot = self.browser_agent.generate_review_snapshot(payload)
+        snapshot = self._direct_generate_review_snapshot(payload)
         return json.dumps({"review_snapshot": snapshot})
 
     @_decorate_tool
@@ -134,7 +214,7 @@ class _WorkflowTools:
         review_snapshot: str,
     ) -> str:
         """Submit the prior-auth form through selected browser mode."""
-        submission = self.browser_agent.submit(
+        submission = self._direct_submit_form(
             payload=payload,
             approved=approved,
             review_snapshot=review_snapshot,
@@ -152,6 +232,7 @@ class StrandsPriorAuthOrchestrator:
         reasoning_agent: ClinicalReasoningAgent | None = None,
         browser_agent: BrowserAutomationAgent | None = None,
         model_id: str | None = None,
+        direct_tool_calls: bool | None = None,
     ) -> None:
         if not strands_available():
             raise RuntimeError(
@@ -164,6 +245,12 @@ class StrandsPriorAuthOrchestrator:
         self.reasoning_agent = reasoning_agent or ClinicalReasoningAgent()
         self.browser_agent = browser_agent or BrowserAutomationAgent()
         self.model_id = model_id or os.getenv("STRANDS_MODEL_ID", "amazon.nova-lite-v1:0")
+        direct_toggle = os.getenv("STRANDS_DIRECT_TOOL_CALLS", "0").lower() in {"1", "true", "yes"}
+        self.direct_tool_calls = direct_toggle if direct_tool_calls is None else direct_tool_calls
+
+        # Intake output of transcripts that failed eligibility, keyed by digest.
+        self._eligibility_cache: dict[str, ExtractedClinicalData] = {}
+        self._eligibility_cache_lock = threading.Lock()
 
         self._tools = _WorkflowTools(
             voice_agent=self.voice_agent,
@@ -180,7 +267,7 @@ class StrandsPriorAuthOrchestrator:
         self.coding_stage = self._build_stage_agent(
             name="Clinical Coding Agent",
             description="Maps ICD-10 and CPT codes for the request.",
-            tools=[self._tools.map_clinical_codes],
+            tools=[self._tools.map_clinical_codes, self._tools.map_codes_and_justify],
         )
         self.retrieval_stage = self._build_stage_agent(
             name="Policy Retrieval Agent",
@@ -252,6 +339,28 @@ class StrandsPriorAuthOrchestrator:
             raise ValueError("Strands tool response JSON must be an object.")
         return parsed
 
+    @staticmethod
+    def _transcript_key(transcript: str) -> str:
+        return hashlib.blake2b(transcript.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cached_ineligible_intake(self, key: str) -> ExtractedClinicalData | None:
+        with self._eligibility_cache_lock:
+            extracted = self._eligibility_cache.get(key)
+        if extracted is None:
+            return None
+        # Each result gets its own copy of the mutable findings list.
+        return replace(extracted, clinical_findings=list(extracted.clinical_findings))
+
+    def _remember_ineligible_intake(self, key: str, extracted: ExtractedClinicalData) -> None:
+        with self._eligibility_cache_lock:
+            self._eligibility_cache.pop(key, None)
+            while len(self._eligibility_cache) >= _ELIGIBILITY_CACHE_MAX_ENTRIES:
+                oldest = next(iter(self._eligibility_cache))
+                del self._eligibility_cache[oldest]
+            self._eligibility_cache[key] = replace(
+                extracted, clinical_findings=list(extracted.clinical_findings)
+            )
+
     def run(
         self,
         transcript: str,
@@ -272,15 +381,28 @@ class StrandsPriorAuthOrchestrator:
                 trace_hook=trace_hook,
             )
 
+        # Transcripts already known to fail eligibility replay their intake
+        # output instead of re-running extraction; the trace keeps its shape.
+        transcript_key = self._transcript_key(transcript)
+        cached_intake = self._cached_ineligible_intake(transcript_key)
+        result.eligibility_cached = cached_intake is not None
+
         emit("Voice Intake", "in_progress", "Parsing clinician transcript.")
         with tracer.start_as_current_span("voice_intake") as span:
             span.set_attribute("transcript_length", len(transcript))
-            extracted_payload = self._tool_json(
-                self.intake_stage.tool.extract_clinical_data(transcript=transcript)
-            )
-            span.set_attribute("patient_name", str(extracted_payload.get("patient_name", "")))
-            span.set_attribute("payer_name", str(extracted_payload.get("payer_name", "")))
-        extracted = ExtractedClinicalData(**extracted_payload)
+            span.set_attribute("cached", result.eligibility_cached)
+            if cached_intake is not None:
+                extracted = cached_intake
+            elif self.direct_tool_calls:
+                extracted = self._tools._direct_extract_clinical_data(transcript)
+            else:
+                extracted = ExtractedClinicalData(
+                    **self._tool_json(
+                        self.intake_stage.tool.extract_clinical_data(transcript=transcript)
+                    )
+                )
+            span.set_attribute("patient_name", extracted.patient_name)
+            span.set_attribute("payer_name", extracted.payer_name)
         result.extracted_data = extracted
         emit(
             "Voice Intake",
@@ -299,6 +421,8 @@ class StrandsPriorAuthOrchestrator:
                     "Missing member ID from intake transcript.",
                 )
                 result.next_action = "collect_missing_member_id"
+                if cached_intake is None:
+                    self._remember_ineligible_intake(transcript_key, extracted)
                 return result
         emit(
             "Eligibility Verification",
@@ -306,14 +430,66 @@ class StrandsPriorAuthOrchestrator:
             f"Member ID {extracted.member_id} is present.",
         )
 
+        def fetch_policy(procedure_code: str) -> PolicyMatch:
+            if self.direct_tool_calls:
+                return self._tools._direct_retrieve_payer_policy(
+                    payer_name=extracted.payer_name,
+                    member_id=extracted.member_id,
+                    procedure_code=procedure_code,
+                    requested_service=extracted.requested_service,
+                )
+            return PolicyMatch(
+                **self._tool_json(
+                    self.retrieval_stage.tool.retrieve_payer_policy(
+                        payer_name=extracted.payer_name,
+                        member_id=extracted.member_id,
+                        procedure_code=procedure_code,
+                        requested_service=extracted.requested_service,
+                    )
+                )
+            )
+
+        # Retrieval only needs the CPT code, so it starts on the predicted code
+        # and overlaps the coding stage.
+        policy_lookup = SpeculativePolicyLookup(
+            fetch_policy, self.reasoning_agent.predict_procedure_code(extracted)
+        )
+
+        # With Nova coding and justification, one request returns both, drafted
+        # against the speculative policy; it is reused if coding confirms it.
+        # Only a policy that is already in hand is used: waiting for it here
+        # would serialize retrieval ahead of coding.
+        speculative_policy = (
+            policy_lookup.speculative() if self.reasoning_agent.combines_nova_calls else None
+        )
+        necessity: NecessityDecision | None = None
+
         emit("Clinical Coding", "in_progress", "Mapping ICD-10 and CPT codes.")
         with tracer.start_as_current_span("clinical_coding") as span:
-            coding_payload = self._tool_json(
-                self.coding_stage.tool.map_clinical_codes(extracted_data=extracted.to_dict())
-            )
-            span.set_attribute("diagnosis_code", str(coding_payload.get("diagnosis_code", "")))
-            span.set_attribute("procedure_code", str(coding_payload.get("procedure_code", "")))
-        coding = CodingResult(**coding_payload)
+            span.set_attribute("combined_justification", speculative_policy is not None)
+            if speculative_policy is not None and self.direct_tool_calls:
+                coding, necessity = self._tools._direct_map_codes_and_justify(
+                    extracted, speculative_policy
+                )
+            elif speculative_policy is not None:
+                combined = self._tool_json(
+                    self.coding_stage.tool.map_codes_and_justify(
+                        extracted_data=extracted.to_dict(),
+                        policy_data=speculative_policy.to_dict(),
+                    )
+                )
+                coding = CodingResult(**combined["coding"])
+                necessity = NecessityDecision(**combined["necessity"])
+            elif self.direct_tool_calls:
+                coding = self._tools._direct_map_clinical_codes(extracted)
+            else:
+                coding = CodingResult(
+                    **self._tool_json(
+                        self.coding_stage.tool.map_clinical_codes(extracted_data=extracted.to_dict())
+                    )
+                )
+            span.set_attribute("diagnosis_code", coding.diagnosis_code)
+            span.set_attribute("procedure_code", coding.procedure_code)
         result.coding = coding
         emit(
             "Clinical Coding",
@@ -323,16 +499,8 @@ class StrandsPriorAuthOrchestrator:
 
         emit("Knowledge Retrieval", "in_progress", "Fetching payer policy criteria.")
         with tracer.start_as_current_span("knowledge_retrieval") as span:
-            policy_payload = self._tool_json(
-                self.retrieval_stage.tool.retrieve_payer_policy(
-                    payer_name=extracted.payer_name,
-                    member_id=extracted.member_id,
-                    procedure_code=coding.procedure_code,
-                    requested_service=extracted.requested_service,
-                )
-            )
-            span.set_attribute("policy_id", str(policy_payload.get("policy_id", "")))
-        policy = PolicyMatch(**policy_payload)
+            policy = policy_lookup.result(coding.procedure_code)
+            span.set_attribute("policy_id", policy.policy_id)
         result.policy = policy
         emit(
             "Knowledge Retrieval",
@@ -342,19 +510,22 @@ class StrandsPriorAuthOrchestrator:
 
         emit("Medical Necessity Analysis", "in_progress", "Evaluating policy criteria.")
         with tracer.start_as_current_span("medical_necessity") as span:
-            necessity_payload = self._tool_json(
-                self.necessity_stage.tool.evaluate_necessity(
-                    extracted_data=extracted.to_dict(),
-                    coding_data=coding.to_dict(),
-                    policy_data=policy.to_dict(),
+            if necessity is not None and policy is speculative_policy:
+                pass  # drafted with the coding call against this same policy
+            elif self.direct_tool_calls:
+                necessity = self._tools._direct_evaluate_necessity(extracted, coding, policy)
+            else:
+                necessity = NecessityDecision(
+                    **self._tool_json(
+                        self.necessity_stage.tool.evaluate_necessity(
+                            extracted_data=extracted.to_dict(),
+                            coding_data=coding.to_dict(),
+                            policy_data=policy.to_dict(),
+                        )
+                    )
                 )
-            )
-            span.set_attribute("meets_criteria", bool(necessity_payload.get("meets_criteria", False)))
-            span.set_attribute(
-                "extended_thinking_used",
-                bool(necessity_payload.get("extended_thinking_used", False)),
-            )
-        necessity = NecessityDecision(**necessity_payload)
+            span.set_attribute("meets_criteria", bool(necessity.meets_criteria))
+            span.set_attribute("extended_thinking_used", bool(necessity.extended_thinking_used))
         result.necessity = necessity
         emit(
             "Medical Necessity Analysis",
@@ -364,14 +535,19 @@ class StrandsPriorAuthOrchestrator:
 
         emit("Form Population", "in_progress", "Building PA submission payload.")
         with tracer.start_as_current_span("form_population") as span:
-            payload = self._tool_json(
-                self.payload_stage.tool.build_submission_payload(
-                    extracted_data=extracted.to_dict(),
-                    coding_data=coding.to_dict(),
-                    necessity_data=necessity.to_dict(),
-                    policy_data=policy.to_dict(),
+            if self.direct_tool_calls:
+                payload = self._tools._direct_build_submission_payload(
+                    extracted, coding, necessity, policy
+                )
+            else:
+                payload = self._tool_json(
+                    self.payload_stage.tool.build_submission_payload(
+                        extracted_data=extracted.to_dict(),
+                        coding_data=coding.to_dict(),
+                        necessity_data=necessity.to_dict(),
+                        policy_data=policy.to_dict(),
+                    )
                 )
-            )
             span.set_attribute("payload_fields", len(payload))
         emit("Form Population", "completed", "Payload built for browser automation.")
 
@@ -379,24 +555,35 @@ class StrandsPriorAuthOrchestrator:
         approved = reviewer_approved if reviewer_approved is not None else auto_approve
         with tracer.start_as_current_span("human_review") as span:
             span.set_attribute("approved", approved)
-            snapshot_payload = self._tool_json(
-                self.review_stage.tool.generate_review_snapshot(payload=payload)
-            )
-            review_snapshot = str(snapshot_payload.get("review_snapshot", "")).strip()
+            if self.direct_tool_calls:
+                review_snapshot = self._tools._direct_generate_review_snapshot(payload).strip()
+            else:
+                snapshot_payload = self._tool_json(
+                    self.review_stage.tool.generate_review_snapshot(payload=payload)
+                )
+                review_snapshot = str(snapshot_payload.get("review_snapshot", "")).strip()
         emit("Human Review", "completed", f"approved={approved}.")
 
         emit("Portal Submission", "in_progress", "Executing portal form submission.")
         with tracer.start_as_current_span("portal_submission") as span:
-            submission_payload = self._tool_json(
-                self.submission_stage.tool.submit_form(
+            if self.direct_tool_calls:
+                submission = self._tools._direct_submit_form(
                     payload=payload,
                     approved=approved,
                     review_snapshot=review_snapshot,
                 )
-            )
-            span.set_attribute("submission_status", str(submission_payload.get("status", "")))
-            span.set_attribute("submission_reference", str(submission_payload.get("reference", "")))
-        submission = SubmissionResult(**submission_payload)
+            else:
+                submission = SubmissionResult(
+                    **self._tool_json(
+                        self.submission_stage.tool.submit_form(
+                            payload=payload,
+                            approved=approved,
+                            review_snapshot=review_snapshot,
+                        )
+                    )
+                )
+            span.set_attribute("submission_status", submission.status)
+            span.set_attribute("submission_reference", submission.reference)
         result.submission = submission
 
         if submission.status == "submitted":
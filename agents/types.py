@@ -69,7 +69,7 @@ class NecessityDecision:
         return asdict(self)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SubmissionResult:
     status: str
     message: str
@@ -101,9 +101,11 @@ class PriorAuthWorkflowResult:
     necessity: NecessityDecision | None = None
     submission: SubmissionResult | None = None
     next_action: str = ""
+    # True when intake was replayed from a cached failed-eligibility verdict.
+    eligibility_cached: bool = False
 
     def to_dict(self) -> dict[str, Any]:
-        return {
+        payload = {
             "trace": [step.to_dict() for step in self.trace],
             "extracted_data": self.extracted_data.to_dict() if self.extracted_data else None,
             "coding": self.coding.to_dict() if self.coding else None,
@@ -112,3 +114,7 @@ class PriorAuthWorkflowResult:
             "submission": self.submission.to_dict() if self.submission else None,
             "next_action": self.next_action,
         }
+        # Only cache hits carry the marker, so ordinary results keep their shape.
+        if self.eligibility_cached:
+            payload["eligibility_cached"] = True
+        return payload
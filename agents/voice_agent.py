@@ -5,6 +5,52 @@ from datetime import datetime
 
 from agents.types import ExtractedClinicalData
 
+# Extraction patterns are compiled once at import rather than looked up in
+# re's cache on every ingest() call.
+_PATIENT_NAME_RE = re.compile(r"\bfor\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,2})")
+_DATE_OF_BIRTH_RE = re.compile(
+    r"date of birth\s+([A-Za-z]+\s+\d{1,2}(?:,\s*|\s+)\d{4}|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})",
+    flags=re.IGNORECASE,
+)
+_MEMBER_ID_RE = re.compile(r"\b([A-Z]{2,5}-\d{5,12})\b")
+_PROVIDER_NPI_RE = re.compile(r"\bNPI\s*(\d{10})\b", flags=re.IGNORECASE)
+_FACILITY_RE = re.compile(r"\bat\s+(?:our\s+)?([A-Za-z0-9 .'-]+?)(?:[,.]|$)", flags=re.IGNORECASE)
+_THERAPY_WEEKS_DIGIT_RE = re.compile(
+    r"(\d+)\s+weeks?\s+of\s+(?:physical\s+therapy|conservative)"
+)
+_THERAPY_WEEKS_WORD_RE = re.compile(
+    r"(one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\s+weeks?\s+of\s+"
+    r"(?:physical\s+therapy|conservative)"
+)
+_IMAGING_EVIDENCE_RE = re.compile(
+    r"(confirmed on [^,.]+|seen on [^,.]+|demonstrated on [^,.]+)",
+    flags=re.IGNORECASE,
+)
+
+_WORD_TO_NUMBER = {
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+}
+
+_KEYWORD_TO_FINDING = {
+    "radiculopathy": "Radiculopathy",
+    "disc herniation": "Disc herniation",
+    "numbness": "Numbness",
+    "weakness": "Motor weakness",
+    "back pain": "Back pain",
+    "sciatica": "Sciatica symptoms",
+}
+
 
 class VoiceIntakeAgent:
     """
@@ -66,18 +112,14 @@ class VoiceIntakeAgent:
 
     @staticmethod
     def _extract_patient_name(transcript: str) -> str:
-        match = re.search(r"\bfor\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,2})", transcript)
+        match = _PATIENT_NAME_RE.search(transcript)
         if match:
             return match.group(1).strip()
         return ""
 
     @staticmethod
     def _extract_date_of_birth(transcript: str) -> str:
-        dob_match = re.search(
-            r"date of birth\s+([A-Za-z]+\s+\d{1,2}(?:,\s*|\s+)\d{4}|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})",
-            transcript,
-            flags=re.IGNORECASE,
-        )
+        dob_match = _DATE_OF_BIRTH_RE.search(transcript)
         if not dob_match:
             return ""
 
@@ -98,7 +140,7 @@ class VoiceIntakeAgent:
 
     @staticmethod
     def _extract_member_id(transcript: str) -> str:
-        match = re.search(r"\b([A-Z]{2,5}-\d{5,12})\b", transcript)
+        match = _MEMBER_ID_RE.search(transcript)
         return match.group(1) if match else ""
 
     def _infer_payer(self, lowered_transcript: str, member_id: str) -> str:
@@ -114,7 +156,7 @@ class VoiceIntakeAgent:
 
     @staticmethod
     def _extract_provider_npi(transcript: str) -> str:
-        match = re.search(r"\bNPI\s*(\d{10})\b", transcript, flags=re.IGNORECASE)
+        match = _PROVIDER_NPI_RE.search(transcript)
         return match.group(1) if match else ""
 
     @staticmethod
@@ -129,11 +171,7 @@ class VoiceIntakeAgent:
 
     @staticmethod
     def _extract_facility(transcript: str) -> str:
-        match = re.search(
-            r"\bat\s+(?:our\s+)?([A-Za-z0-9 .'-]+?)(?:[,.]|$)",
-            transcript,
-            flags=re.IGNORECASE,
-        )
+        match = _FACILITY_RE.search(transcript)
         if not match:
             return "Demo Outpatient Center"
         facility = match.group(1).strip()
@@ -151,60 +189,25 @@ class VoiceIntakeAgent:
 
     @staticmethod
     def _extract_conservative_therapy_weeks(lowered_transcript: str) -> int | None:
-        digit_match = re.search(
-            r"(\d+)\s+weeks?\s+of\s+(?:physical\s+therapy|conservative)",
-            lowered_transcript,
-        )
+        digit_match = _THERAPY_WEEKS_DIGIT_RE.search(lowered_transcript)
         if digit_match:
             return int(digit_match.group(1))
 
-        word_match = re.search(
-            r"(one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve)\s+weeks?\s+of\s+"
-            r"(?:physical\s+therapy|conservative)",
-            lowered_transcript,
-        )
+        word_match = _THERAPY_WEEKS_WORD_RE.search(lowered_transcript)
         if word_match:
-            word_to_number = {
-                "one": 1,
-                "two": 2,
-                "three": 3,
-                "four": 4,
-                "five": 5,
-                "six": 6,
-                "seven": 7,
-                "eight": 8,
-                "nine": 9,
-                "ten": 10,
-                "eleven": 11,
-                "twelve": 12,
-            }
-            return word_to_number[word_match.group(1)]
+            return _WORD_TO_NUMBER[word_match.group(1)]
         return None
 
     @staticmethod
     def _extract_imaging_evidence(transcript: str) -> str:
-        match = re.search(
-            r"(confirmed on [^,.]+|seen on [^,.]+|demonstrated on [^,.]+)",
-            transcript,
-            flags=re.IGNORECASE,
-        )
+        match = _IMAGING_EVIDENCE_RE.search(transcript)
         return match.group(1).strip() if match else ""
 
     @staticmethod
     def _extract_clinical_findings(lowered_transcript: str) -> list[str]:
-        findings: list[str] = []
-
-        keyword_to_finding = {
-            "radiculopathy": "Radiculopathy",
-            "disc herniation": "Disc herniation",
-            "numbness": "Numbness",
-            "weakness": "Motor weakness",
-            "back pain": "Back pain",
-            "sciatica": "Sciatica symptoms",
-        }
-        for keyword, label in keyword_to_finding.items():
-            if keyword in lowered_transcript:
-                findings.append(label)
+        findings = [
+            label for keyword, label in _KEYWORD_TO_FINDING.items() if keyword in lowered_transcript
+        ]
 
         if not findings:
             findings.append("General clinical indication documented")
@@ -9,19 +9,34 @@ Steps performed:
     2. Creates IAM role for Bedrock KB
     3. Creates OpenSearch Serverless collection (vector store)
     4. Creates Bedrock Knowledge Base with Titan Text Embeddings v2
-    5. Creates S3 data source and starts ingestion
+    5. Creates one S3 data source per payer prefix and ingests them in turn
     6. Saves KB ID to kb_config.json
+
+Steps 1-3 have no dependencies on each other and run concurrently. The S3
+upload keeps running through steps 4-5 and is only awaited right before
+ingestion starts.
 """
 
 from __future__ import annotations
 
+import functools
+import gzip
+import hashlib
+import io
 import json
+import os
+import random
 import sys
 import time
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Any, Callable
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from s3transfer.manager import TransferConfig, TransferManager
 
 REGION = "us-east-1"
 ACCOUNT_ID = None  # resolved at runtime
@@ -32,15 +47,87 @@ KB_DESCRIPTION = "Payer-specific prior authorization policy criteria for medical
 # Keep this aligned with the Bedrock KB "supported embedding models" documentation.
 EMBEDDING_MODEL_ARN = f"arn:aws:bedrock:{REGION}::foundation-model/amazon.titan-embed-text-v2:0"
 ROLE_NAME = "PriorAuthKBBedrockRole"
+INLINE_POLICY_NAME = "PriorAuthKBAccess"
 COLLECTION_NAME = "priorauth-policies"
 INDEX_NAME = "bedrock-knowledge-base-default-index"
 POLICY_DOCS_DIR = Path(__file__).resolve().parent / "policy_docs"
 CONFIG_PATH = Path(__file__).resolve().parent / "kb_config.json"
-
-
-def get_account_id() -> str:
+DATA_SOURCE_NAME = "payer-policy-docs"
+# Larger chunks mean fewer embedding calls per document; override for long guidelines.
+CHUNK_MAX_TOKENS = int(os.getenv("KB_CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_PERCENTAGE = 20
+# FIXED_SIZE (default), HIERARCHICAL, or SEMANTIC.
+CHUNKING_STRATEGY = os.getenv("KB_CHUNKING_STRATEGY", "FIXED_SIZE").strip().upper()
+
+# Opt-in: gzip policy docs of at least GZIP_MIN_BYTES and upload them with
+# Content-Encoding: gzip. Off by default because Bedrock ingestion is only
+# documented against uncompressed S3 text; below the threshold TLS and request
+# overhead dominate anyway.
+GZIP_UPLOADS = os.getenv("KB_GZIP_UPLOADS", "0").lower() in {"1", "true", "yes"}
+GZIP_MIN_BYTES = 64 * 1024
+
+MB = 1024 * 1024
+UPLOAD_MAX_WORKERS = 16
+# Shared by every client: a wide connection pool so concurrent upload threads are
+# not serialized, adaptive retries so throttled status polls back off client-side,
+# and TCP keepalive so polling loops reuse their TLS connections.
+CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+# One TransferManager carries every upload, reusing its executor and connections.
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_request_concurrency=16,
+    max_submission_concurrency=4,
+)
+
+
+def _poll(
+    fn: Callable[[], Any],
+    is_done: Callable[[Any], bool],
+    is_failed: Callable[[Any], bool],
+    *,
+    start: float = 1.0,
+    cap: float = 15.0,
+    max_total: float = 600.0,
+    on_wait: Callable[[Any], None] | None = None,
+) -> Any | None:
+    """
+    Call fn with jittered exponential backoff until is_done or is_failed holds.
+    Returns the last result, or None if max_total seconds elapse first.
+    """
+    deadline = time.monotonic() + max_total
+    attempt = 0
+    while True:
+        result = fn()
+        if is_done(result) or is_failed(result):
+            return result
+        delay = min(cap, start * 2 ** attempt) * random.uniform(0.8, 1.2)
+        if time.monotonic() + delay > deadline:
+            return None
+        if on_wait is not None:
+            on_wait(result)
+        time.sleep(delay)
+        attempt += 1
+
+
+def credentials_fingerprint(session: boto3.session.Session) -> str:
+    """Short hash of the profile and access key in use; resolved locally, no API call."""
+    credentials = session.get_credentials()
+    access_key = credentials.access_key if credentials is not None else ""
+    identity = f"{session.profile_name}:{access_key}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+def get_account_id(session: boto3.session.Session, cached: str | None = None) -> str:
     global ACCOUNT_ID
-    sts = boto3.client("sts", region_name=REGION)
+    if cached:
+        ACCOUNT_ID = cached
+        return ACCOUNT_ID
+    sts = session.client("sts", config=CLIENT_CONFIG)
     ACCOUNT_ID = sts.get_caller_identity()["Account"]
     return ACCOUNT_ID
 
@@ -60,50 +147,114 @@ def create_s3_bucket(s3) -> None:
         print(f"[S3] Created: {BUCKET_NAME}")
 
 
-def upload_policy_docs(s3) -> int:
-    count = 0
-    for doc_path in sorted(POLICY_DOCS_DIR.glob("*.txt")):
-        key = f"policies/{doc_path.name}"
-        s3.upload_file(str(doc_path), BUCKET_NAME, key)
-        print(f"  Uploaded: s3://{BUCKET_NAME}/{key}")
-        count += 1
-    return count
+def _remote_object_matches(s3, key: str, md5_hex: str, size: int) -> bool:
+    try:
+        head = s3.head_object(Bucket=BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return head.get("ETag", "").strip('"') == md5_hex and head.get("ContentLength") == size
 
 
-# ── IAM ─────────────────────────────────────────────────────────────
+def _policy_doc_group(name: str) -> str:
+    """Payer prefix of a policy doc file name, e.g. UHC-LUMBAR-MRI-2026.txt -> uhc."""
+    return name.split("-", 1)[0].lower()
 
-def create_iam_role(iam) -> str:
-    role_arn = f"arn:aws:iam::{ACCOUNT_ID}:role/{ROLE_NAME}"
 
-    trust_policy = {
-        "Version": "2012-10-17",
-        "Statement": [
-            {
-                "Effect": "Allow",
-                "Principal": {"Service": "bedrock.amazonaws.com"},
-                "Action": "sts:AssumeRole",
-                "Condition": {
-                    "StringEquals": {"aws:SourceAccount": ACCOUNT_ID},
-                    "ArnLike": {
-                        "aws:SourceArn": f"arn:aws:bedrock:{REGION}:{ACCOUNT_ID}:knowledge-base/*"
-                    },
-                },
-            }
-        ],
-    }
+@functools.lru_cache(maxsize=1)
+def _scan_policy_docs() -> tuple[tuple[str, str, int], ...]:
+    """(name, path, size) for each policy doc, largest first, from one scandir pass."""
+    with os.scandir(POLICY_DOCS_DIR) as entries:
+        docs = [
+            (entry.name, entry.path, entry.stat().st_size)
+            for entry in entries
+            if entry.name.endswith(".txt") and entry.is_file()
+        ]
+    # Largest first, so big transfers start early and small ones fill in the tail of the batch.
+    docs.sort(key=lambda doc: (-doc[2], doc[0]))
+    return tuple(docs)
 
-    try:
-        iam.get_role(RoleName=ROLE_NAME)
-        print(f"[IAM] Role exists: {ROLE_NAME}")
-    except ClientError:
-        print(f"[IAM] Creating role: {ROLE_NAME}")
-        iam.create_role(
-            RoleName=ROLE_NAME,
-            AssumeRolePolicyDocument=json.dumps(trust_policy),
-            Description="Bedrock KB role for PriorAuth agent.",
+
+def _policy_doc_groups() -> list[str]:
+    return sorted({_policy_doc_group(name) for name, _, _ in _scan_policy_docs()})
+
+
+def _policy_doc_changed(s3, name: str, body: bytes) -> tuple[str, bool]:
+    """Returns (key, changed), where changed means S3 does not already hold these exact bytes."""
+    key = f"policies/{_policy_doc_group(name)}/{name}"
+    return key, not _remote_object_matches(s3, key, hashlib.md5(body).hexdigest(), len(body))
+
+
+def _encode_policy_doc(body: bytes) -> tuple[bytes, dict[str, str]]:
+    """Bytes to send plus S3 upload args; gzip output is deterministic so ETag checks stay stable."""
+    extra_args = {"ContentType": "text/plain"}
+    if GZIP_UPLOADS and len(body) >= GZIP_MIN_BYTES:
+        extra_args["ContentEncoding"] = "gzip"
+        return gzip.compress(body, compresslevel=6, mtime=0), extra_args
+    return body, extra_args
+
+
+def upload_policy_docs(s3) -> int:
+    # Policy docs are small: read them all once up front and hand the bytes to the workers.
+    docs = []
+    for name, path, _ in _scan_policy_docs():
+        with open(path, "rb") as doc_file:
+            docs.append((name, *_encode_policy_doc(doc_file.read())))
+    uploads = []
+    with TransferManager(s3, config=UPLOAD_TRANSFER_CONFIG) as transfer:
+        # HEAD checks fan out on their own pool; changed docs are queued on the
+        # shared transfer manager as soon as their check returns.
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as executor:
+            futures = {
+                executor.submit(_policy_doc_changed, s3, name, body): (body, extra_args)
+                for name, body, extra_args in docs
+            }
+            for future in as_completed(futures):
+                key, changed = future.result()
+                if not changed:
+                    print(f"  Unchanged: s3://{BUCKET_NAME}/{key}")
+                    continue
+                body, extra_args = futures[future]
+                upload = transfer.upload(io.BytesIO(body), BUCKET_NAME, key, extra_args=extra_args)
+                uploads.append((key, upload))
+        for key, upload in uploads:
+            upload.result()
+            print(f"  Uploaded: s3://{BUCKET_NAME}/{key}")
+    return len(uploads)
+
+
+def _delete_legacy_policy_docs(s3) -> int:
+    """
+    Remove this script's own docs from the old single-prefix layout
+    (policies/<name>). Other objects under policies/ are left alone.
+    """
+    legacy_keys = {f"policies/{name}" for name, _, _ in _scan_policy_docs()}
+    found = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix="policies/", Delimiter="/"):
+        found.extend(obj["Key"] for obj in page.get("Contents", []) if obj["Key"] in legacy_keys)
+    if found:
+        s3.delete_objects(
+            Bucket=BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in sorted(found)], "Quiet": True},
         )
+        print(f"  Deleted {len(found)} legacy policy docs under s3://{BUCKET_NAME}/policies/")
+    return len(found)
 
-    inline_policy = {
+
+def _sync_policy_docs(s3, legacy_removed: bool = False) -> int:
+    create_s3_bucket(s3)
+    uploaded = upload_policy_docs(s3)
+    if not legacy_removed:
+        _delete_legacy_policy_docs(s3)
+    return uploaded
+
+
+# ── IAM ─────────────────────────────────────────────────────────────
+
+def _inline_policy(account_id: str) -> dict[str, Any]:
+    return {
         "Version": "2012-10-17",
         "Statement": [
             {
@@ -123,26 +274,217 @@ def create_iam_role(iam) -> str:
                 "Effect": "Allow",
                 "Action": ["aoss:APIAccessAll"],
                 "Resource": [
-                    f"arn:aws:aoss:{REGION}:{ACCOUNT_ID}:collection/*"
+                    f"arn:aws:aoss:{REGION}:{account_id}:collection/*"
                 ],
             },
         ],
     }
 
+
+# The policy documents below depend only on module constants and the account ID,
+# so each is serialized once and reused across retries and re-entrant calls.
+
+@functools.lru_cache(maxsize=None)
+def _inline_policy_json(account_id: str) -> str:
+    return json.dumps(_inline_policy(account_id))
+
+
+@functools.lru_cache(maxsize=None)
+def _trust_policy_json(account_id: str) -> str:
+    return json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Principal": {"Service": "bedrock.amazonaws.com"},
+                "Action": "sts:AssumeRole",
+                "Condition": {
+                    "StringEquals": {"aws:SourceAccount": account_id},
+                    "ArnLike": {
+                        "aws:SourceArn": f"arn:aws:bedrock:{REGION}:{account_id}:knowledge-base/*"
+                    },
+                },
+            }
+        ],
+    })
+
+
+@functools.lru_cache(maxsize=None)
+def _enc_policy_json() -> str:
+    return json.dumps({
+        "Rules": [
+            {
+                "Resource": [f"collection/{COLLECTION_NAME}"],
+                "ResourceType": "collection",
+            }
+        ],
+        "AWSOwnedKey": True,
+    })
+
+
+@functools.lru_cache(maxsize=None)
+def _net_policy_json() -> str:
+    return json.dumps([
+        {
+            "Rules": [
+                {
+                    "Resource": [f"collection/{COLLECTION_NAME}"],
+                    "ResourceType": "collection",
+                }
+            ],
+            "AllowFromPublic": True,
+        }
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def _access_policy_json(account_id: str) -> str:
+    return json.dumps([
+        {
+            "Rules": [
+                {
+                    "Resource": [f"collection/{COLLECTION_NAME}"],
+                    "Permission": [
+                        "aoss:CreateCollectionItems",
+                        "aoss:DeleteCollectionItems",
+                        "aoss:UpdateCollectionItems",
+                        "aoss:DescribeCollectionItems",
+                    ],
+                    "ResourceType": "collection",
+                },
+                {
+                    "Resource": [f"index/{COLLECTION_NAME}/*"],
+                    "Permission": [
+                        "aoss:CreateIndex",
+                        "aoss:DeleteIndex",
+                        "aoss:UpdateIndex",
+                        "aoss:DescribeIndex",
+                        "aoss:ReadDocument",
+                        "aoss:WriteDocument",
+                    ],
+                    "ResourceType": "index",
+                },
+            ],
+            "Principal": [
+                f"arn:aws:iam::{account_id}:role/{ROLE_NAME}",
+                f"arn:aws:iam::{account_id}:user/nova-hackathon-ayush",
+            ],
+        }
+    ])
+
+
+def _policy_sha256(policy: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(policy, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _attached_inline_policy(iam) -> dict[str, Any] | None:
+    try:
+        document = iam.get_role_policy(RoleName=ROLE_NAME, PolicyName=INLINE_POLICY_NAME)[
+            "PolicyDocument"
+        ]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "NoSuchEntity":
+            return None
+        raise
+    # boto3 normally decodes the URL-encoded document into a dict already.
+    if isinstance(document, str):
+        document = json.loads(urllib.parse.unquote(document))
+    return document
+
+
+def _role_policy_allowed(result: dict[str, Any]) -> bool:
+    entries = result.get("EvaluationResults", [])
+    return bool(entries) and all(entry["EvalDecision"] == "allowed" for entry in entries)
+
+
+def _wait_for_role_policy(iam, role_arn: str) -> None:
+    """
+    Poll IAM's policy simulator until the new inline policy grants embedding access.
+    Callers without iam:SimulatePrincipalPolicy fall back to the old fixed wait.
+    """
+    try:
+        result = _poll(
+            lambda: iam.simulate_principal_policy(
+                PolicySourceArn=role_arn,
+                ActionNames=["bedrock:InvokeModel"],
+                ResourceArns=[EMBEDDING_MODEL_ARN],
+            ),
+            is_done=_role_policy_allowed,
+            is_failed=lambda r: False,
+            max_total=60,
+            on_wait=lambda r: print("  Role policy not visible yet, waiting..."),
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("AccessDenied", "AccessDeniedException"):
+            raise
+        print("[IAM] Cannot simulate the role policy; waiting 10s instead")
+        time.sleep(10)
+        return
+    if result is None:
+        print("[IAM] Policy still propagating; continuing")
+
+
+def create_iam_role(
+    iam,
+    cached_role_arn: str | None = None,
+    cached_policy_sha256: str | None = None,
+) -> tuple[str, str]:
+    """Ensure the KB role and its inline policy exist; returns (role_arn, policy_sha256)."""
+    role_arn = f"arn:aws:iam::{ACCOUNT_ID}:role/{ROLE_NAME}"
+    inline_policy = _inline_policy(ACCOUNT_ID)
+    policy_sha256 = _policy_sha256(inline_policy)
+    if cached_role_arn == role_arn and cached_policy_sha256 == policy_sha256:
+        # One read confirms both the role and its policy are still in place.
+        attached_policy = _attached_inline_policy(iam)
+        if attached_policy is not None and _policy_sha256(attached_policy) == policy_sha256:
+            print(f"[IAM] Role unchanged since last run: {role_arn}")
+            return role_arn, policy_sha256
+        print(f"[IAM] Cached role is missing or changed; re-checking: {ROLE_NAME}")
+
+    attached_policy = None
+    try:
+        iam.get_role(RoleName=ROLE_NAME)
+        print(f"[IAM] Role exists: {ROLE_NAME}")
+    except ClientError:
+        print(f"[IAM] Creating role: {ROLE_NAME}")
+        iam.create_role(
+            RoleName=ROLE_NAME,
+            AssumeRolePolicyDocument=_trust_policy_json(ACCOUNT_ID),
+            Description="Bedrock KB role for PriorAuth agent.",
+        )
+    else:
+        attached_policy = _attached_inline_policy(iam)
+
+    if attached_policy is not None and _policy_sha256(attached_policy) == policy_sha256:
+        print(f"[IAM] Inline policy already current: {role_arn}")
+        return role_arn, policy_sha256
+
     iam.put_role_policy(
         RoleName=ROLE_NAME,
-        PolicyName="PriorAuthKBAccess",
-        PolicyDocument=json.dumps(inline_policy),
+        PolicyName=INLINE_POLICY_NAME,
+        PolicyDocument=_inline_policy_json(ACCOUNT_ID),
     )
     print(f"[IAM] Role ready: {role_arn}")
     print("[IAM] Waiting for propagation...")
-    time.sleep(10)
-    return role_arn
+    _wait_for_role_policy(iam, role_arn)
+    return role_arn, policy_sha256
 
 
 # ── OpenSearch Serverless ───────────────────────────────────────────
 
-def create_opensearch_collection(aoss) -> str:
+def create_opensearch_collection(
+    aoss,
+    cached_arn: str | None = None,
+    cached_endpoint: str | None = None,
+) -> tuple[str, str]:
+    if cached_arn and cached_endpoint:
+        cached = aoss.batch_get_collection(names=[COLLECTION_NAME]).get("collectionDetails", [])
+        if cached and cached[0].get("arn") == cached_arn and cached[0].get("status") == "ACTIVE":
+            print(f"[AOSS] Using collection from {CONFIG_PATH.name}: {cached_arn}")
+            _ensure_access_policy(aoss)
+            return cached_arn, cached_endpoint
+        print(f"[AOSS] Cached collection is gone or not ACTIVE; re-checking: {COLLECTION_NAME}")
+
     # Check if collection already exists
     collections = aoss.list_collections(
         collectionFilters={"name": COLLECTION_NAME}
@@ -159,15 +501,7 @@ def create_opensearch_collection(aoss) -> str:
             aoss.create_security_policy(
                 name=enc_policy_name,
                 type="encryption",
-                policy=json.dumps({
-                    "Rules": [
-                        {
-                            "Resource": [f"collection/{COLLECTION_NAME}"],
-                            "ResourceType": "collection",
-                        }
-                    ],
-                    "AWSOwnedKey": True,
-                }),
+                policy=_enc_policy_json(),
             )
             print(f"[AOSS] Created encryption policy: {enc_policy_name}")
         except ClientError as e:
@@ -182,17 +516,7 @@ def create_opensearch_collection(aoss) -> str:
             aoss.create_security_policy(
                 name=net_policy_name,
                 type="network",
-                policy=json.dumps([
-                    {
-                        "Rules": [
-                            {
-                                "Resource": [f"collection/{COLLECTION_NAME}"],
-                                "ResourceType": "collection",
-                            }
-                        ],
-                        "AllowFromPublic": True,
-                    }
-                ]),
+                policy=_net_policy_json(),
             )
             print(f"[AOSS] Created network policy: {net_policy_name}")
         except ClientError as e:
@@ -212,77 +536,54 @@ def create_opensearch_collection(aoss) -> str:
         print(f"[AOSS] Created collection: {collection_id}")
 
     # Wait for ACTIVE
-    for _ in range(60):
-        batch = aoss.batch_get_collection(ids=[collection_id])
-        details = batch.get("collectionDetails", [{}])[0]
-        status = details.get("status", "CREATING")
-        if status == "ACTIVE":
-            collection_arn = details["arn"]
-            print(f"[AOSS] Collection ACTIVE: {collection_arn}")
-
-            # Data access policy (allows Bedrock role + current user)
-            access_policy_name = f"{COLLECTION_NAME}-access"
-            try:
-                aoss.create_access_policy(
-                    name=access_policy_name,
-                    type="data",
-                    policy=json.dumps([
-                        {
-                            "Rules": [
-                                {
-                                    "Resource": [f"collection/{COLLECTION_NAME}"],
-                                    "Permission": [
-                                        "aoss:CreateCollectionItems",
-                                        "aoss:DeleteCollectionItems",
-                                        "aoss:UpdateCollectionItems",
-                                        "aoss:DescribeCollectionItems",
-                                    ],
-                                    "ResourceType": "collection",
-                                },
-                                {
-                                    "Resource": [f"index/{COLLECTION_NAME}/*"],
-                                    "Permission": [
-                                        "aoss:CreateIndex",
-                                        "aoss:DeleteIndex",
-                                        "aoss:UpdateIndex",
-                                        "aoss:DescribeIndex",
-                                        "aoss:ReadDocument",
-                                        "aoss:WriteDocument",
-                                    ],
-                                    "ResourceType": "index",
-                                },
-                            ],
-                            "Principal": [
-                                f"arn:aws:iam::{ACCOUNT_ID}:role/{ROLE_NAME}",
-                                f"arn:aws:iam::{ACCOUNT_ID}:user/nova-hackathon-ayush",
-                            ],
-                        }
-                    ]),
-                )
-                print(f"[AOSS] Created access policy: {access_policy_name}")
-            except ClientError as e:
-                if "already exists" in str(e).lower() or "409" in str(e):
-                    print(f"[AOSS] Access policy exists: {access_policy_name}")
-                else:
-                    raise
-
-            return collection_arn, details.get("collectionEndpoint", "")
-        if status == "FAILED":
-            print(f"[AOSS] Collection FAILED")
-            sys.exit(1)
-        print(f"  Collection status: {status}, waiting...")
-        time.sleep(10)
+    def collection_status(batch: dict[str, Any]) -> str:
+        return batch.get("collectionDetails", [{}])[0].get("status", "CREATING")
+
+    batch = _poll(
+        lambda: aoss.batch_get_collection(ids=[collection_id]),
+        is_done=lambda b: collection_status(b) == "ACTIVE",
+        is_failed=lambda b: collection_status(b) == "FAILED",
+        max_total=600,
+        on_wait=lambda b: print(f"  Collection status: {collection_status(b)}, waiting..."),
+    )
+    if batch is None:
+        print("[AOSS] Timed out waiting for collection")
+        sys.exit(1)
+    if collection_status(batch) == "FAILED":
+        print(f"[AOSS] Collection FAILED")
+        sys.exit(1)
+
+    details = batch["collectionDetails"][0]
+    collection_arn = details["arn"]
+    print(f"[AOSS] Collection ACTIVE: {collection_arn}")
+
+    _ensure_access_policy(aoss)
+    return collection_arn, details.get("collectionEndpoint", "")
+
 
-    print("[AOSS] Timed out waiting for collection")
-    sys.exit(1)
+def _ensure_access_policy(aoss) -> None:
+    """Data access policy (allows Bedrock role + current user); a no-op when it exists."""
+    access_policy_name = f"{COLLECTION_NAME}-access"
+    try:
+        aoss.create_access_policy(
+            name=access_policy_name,
+            type="data",
+            policy=_access_policy_json(ACCOUNT_ID),
+        )
+        print(f"[AOSS] Created access policy: {access_policy_name}")
+    except ClientError as e:
+        if "already exists" in str(e).lower() or "409" in str(e):
+            print(f"[AOSS] Access policy exists: {access_policy_name}")
+        else:
+            raise
 
 
-def create_vector_index(collection_endpoint: str) -> None:
+def create_vector_index(session: boto3.session.Session, collection_endpoint: str) -> None:
     """Create the vector index in OpenSearch Serverless if it doesn't exist."""
     from opensearchpy import OpenSearch, RequestsHttpConnection
     from requests_aws4auth import AWS4Auth
 
-    credentials = boto3.Session().get_credentials().get_frozen_credentials()
+    credentials = session.get_credentials().get_frozen_credentials()
     awsauth = AWS4Auth(
         credentials.access_key,
         credentials.secret_key,
@@ -337,13 +638,60 @@ def create_vector_index(collection_endpoint: str) -> None:
 
 # ── Bedrock KB ──────────────────────────────────────────────────────
 
-def create_knowledge_base(bedrock_agent, role_arn: str, collection_arn: str) -> str:
-    existing = bedrock_agent.list_knowledge_bases(maxResults=100)
-    for kb in existing.get("knowledgeBaseSummaries", []):
-        if kb["name"] == KB_NAME:
-            kb_id = kb["knowledgeBaseId"]
-            print(f"[KB] Already exists: {kb_id}")
-            return kb_id
+def _is_not_found(error: ClientError) -> bool:
+    return error.response.get("Error", {}).get("Code") == "ResourceNotFoundException"
+
+
+def _wait_for_knowledge_base(bedrock_agent, kb_id: str) -> None:
+    status = _poll(
+        lambda: bedrock_agent.get_knowledge_base(knowledgeBaseId=kb_id),
+        is_done=lambda r: r["knowledgeBase"]["status"] == "ACTIVE",
+        is_failed=lambda r: r["knowledgeBase"]["status"] in ("FAILED", "DELETE_IN_PROGRESS"),
+        max_total=150,
+        on_wait=lambda r: print(f"  KB status: {r['knowledgeBase']['status']}, waiting..."),
+    )
+    if status is None:
+        print("[KB] Timed out")
+        sys.exit(1)
+    if status["knowledgeBase"]["status"] != "ACTIVE":
+        reasons = status["knowledgeBase"].get("failureReasons", ["unknown"])
+        print(f"[KB] FAILED: {reasons}")
+        sys.exit(1)
+
+
+def _cached_knowledge_base(bedrock_agent, kb_id: str) -> str | None:
+    """Confirm a KB ID from kb_config.json with one get call instead of listing every KB."""
+    try:
+        kb = bedrock_agent.get_knowledge_base(knowledgeBaseId=kb_id)["knowledgeBase"]
+    except ClientError as e:
+        if _is_not_found(e):
+            return None
+        raise
+    if kb["name"] != KB_NAME or kb["status"] not in ("ACTIVE", "CREATING", "UPDATING"):
+        return None
+    if kb["status"] != "ACTIVE":
+        _wait_for_knowledge_base(bedrock_agent, kb_id)
+    return kb_id
+
+
+def _find_knowledge_base(bedrock_agent) -> str | None:
+    paginator = bedrock_agent.get_paginator("list_knowledge_bases")
+    for page in paginator.paginate(PaginationConfig={"PageSize": 100}):
+        for kb in page.get("knowledgeBaseSummaries", []):
+            if kb["name"] == KB_NAME:
+                return kb["knowledgeBaseId"]
+    return None
+
+
+def create_knowledge_base(
+    bedrock_agent, role_arn: str, collection_arn: str, cached_kb_id: str | None = None
+) -> str:
+    kb_id = _cached_knowledge_base(bedrock_agent, cached_kb_id) if cached_kb_id else None
+    if kb_id is None:
+        kb_id = _find_knowledge_base(bedrock_agent)
+    if kb_id is not None:
+        print(f"[KB] Already exists: {kb_id}")
+        return kb_id
 
     print(f"[KB] Creating: {KB_NAME}")
     kb_config = dict(
@@ -393,123 +741,289 @@ def create_knowledge_base(bedrock_agent, role_arn: str, collection_arn: str) ->
     kb_id = response["knowledgeBase"]["knowledgeBaseId"]
     print(f"[KB] Created: {kb_id}")
 
-    for _ in range(30):
-        status = bedrock_agent.get_knowledge_base(knowledgeBaseId=kb_id)
-        state = status["knowledgeBase"]["status"]
-        if state == "ACTIVE":
-            print(f"[KB] ACTIVE: {kb_id}")
-            return kb_id
-        if state in ("FAILED", "DELETE_IN_PROGRESS"):
-            reasons = status["knowledgeBase"].get("failureReasons", ["unknown"])
-            print(f"[KB] FAILED: {reasons}")
-            sys.exit(1)
-        print(f"  KB status: {state}, waiting...")
-        time.sleep(5)
-
-    print("[KB] Timed out")
-    sys.exit(1)
-
-
-def create_data_source_and_ingest(bedrock_agent, kb_id: str) -> None:
-    existing = bedrock_agent.list_data_sources(knowledgeBaseId=kb_id, maxResults=10)
-    ds_id = None
-    for ds in existing.get("dataSourceSummaries", []):
-        if ds["name"] == "payer-policy-docs":
-            ds_id = ds["dataSourceId"]
-            print(f"[DS] Already exists: {ds_id}")
-            break
+    _wait_for_knowledge_base(bedrock_agent, kb_id)
+    print(f"[KB] ACTIVE: {kb_id}")
+    return kb_id
 
-    if ds_id is None:
-        print("[DS] Creating S3 data source...")
-        response = bedrock_agent.create_data_source(
-            knowledgeBaseId=kb_id,
-            name="payer-policy-docs",
-            description="Payer PA policy documents from S3.",
-            dataSourceConfiguration={
-                "type": "S3",
-                "s3Configuration": {
-                    "bucketArn": f"arn:aws:s3:::{BUCKET_NAME}",
-                    "inclusionPrefixes": ["policies/"],
-                },
+
+def _chunking_configuration() -> dict[str, Any]:
+    if CHUNKING_STRATEGY == "HIERARCHICAL":
+        return {
+            "chunkingStrategy": "HIERARCHICAL",
+            "hierarchicalChunkingConfiguration": {
+                "levelConfigurations": [
+                    {"maxTokens": CHUNK_MAX_TOKENS * 3},
+                    {"maxTokens": CHUNK_MAX_TOKENS},
+                ],
+                "overlapTokens": CHUNK_MAX_TOKENS * CHUNK_OVERLAP_PERCENTAGE // 100,
             },
-            vectorIngestionConfiguration={
-                "chunkingConfiguration": {
-                    "chunkingStrategy": "FIXED_SIZE",
-                    "fixedSizeChunkingConfiguration": {
-                        "maxTokens": 300,
-                        "overlapPercentage": 20,
-                    },
-                }
+        }
+    if CHUNKING_STRATEGY == "SEMANTIC":
+        return {
+            "chunkingStrategy": "SEMANTIC",
+            "semanticChunkingConfiguration": {
+                "maxTokens": CHUNK_MAX_TOKENS,
+                "bufferSize": 0,
+                "breakpointPercentileThreshold": 95,
             },
-        )
-        ds_id = response["dataSource"]["dataSourceId"]
-        print(f"[DS] Created: {ds_id}")
+        }
+    return {
+        "chunkingStrategy": "FIXED_SIZE",
+        "fixedSizeChunkingConfiguration": {
+            "maxTokens": CHUNK_MAX_TOKENS,
+            "overlapPercentage": CHUNK_OVERLAP_PERCENTAGE,
+        },
+    }
 
-    # Start ingestion
-    print("[Ingest] Starting ingestion job...")
-    response = bedrock_agent.start_ingestion_job(
-        knowledgeBaseId=kb_id, dataSourceId=ds_id
+
+def _create_data_source(bedrock_agent, kb_id: str, name: str, prefix: str) -> str:
+    print(f"[DS] Creating S3 data source {name} for s3://{BUCKET_NAME}/{prefix}...")
+    response = bedrock_agent.create_data_source(
+        knowledgeBaseId=kb_id,
+        name=name,
+        description="Payer PA policy documents from S3.",
+        dataSourceConfiguration={
+            "type": "S3",
+            "s3Configuration": {
+                "bucketArn": f"arn:aws:s3:::{BUCKET_NAME}",
+                "inclusionPrefixes": [prefix],
+            },
+        },
+        vectorIngestionConfiguration={"chunkingConfiguration": _chunking_configuration()},
     )
-    job_id = response["ingestionJob"]["ingestionJobId"]
+    ds_id = response["dataSource"]["dataSourceId"]
+    print(f"[DS] Created: {name} ({ds_id})")
+    return ds_id
+
+
+def _start_ingestion_job(bedrock_agent, kb_id: str, ds_id: str, label: str) -> str:
+    """
+    Start an ingestion job and return its ID. Bedrock runs one ingestion job per
+    knowledge base at a time, so back off while another (e.g. from an
+    interrupted earlier run) is still in progress.
+    """
+    delay = 5.0
+    deadline = time.monotonic() + 300
+    while True:
+        try:
+            response = bedrock_agent.start_ingestion_job(
+                knowledgeBaseId=kb_id, dataSourceId=ds_id
+            )
+            return response["ingestionJob"]["ingestionJobId"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConflictException":
+                raise
+            if time.monotonic() + delay > deadline:
+                raise
+        print(f"  Another ingestion job is running; retrying {label} in {delay:.0f}s...")
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(30.0, delay * 2)
+
+
+def _run_ingestion_job(bedrock_agent, kb_id: str, ds_id: str, label: str) -> None:
+    print(f"[Ingest] Starting ingestion job for {label}...")
+    job_id = _start_ingestion_job(bedrock_agent, kb_id, ds_id, label)
 
-    for _ in range(60):
-        status = bedrock_agent.get_ingestion_job(
+    status = _poll(
+        lambda: bedrock_agent.get_ingestion_job(
             knowledgeBaseId=kb_id, dataSourceId=ds_id, ingestionJobId=job_id
+        ),
+        is_done=lambda r: r["ingestionJob"]["status"] == "COMPLETE",
+        is_failed=lambda r: r["ingestionJob"]["status"] == "FAILED",
+        max_total=300,
+        on_wait=lambda r: print(f"  Ingestion {label}: {r['ingestionJob']['status']}, waiting..."),
+    )
+    if status is None:
+        print(f"[Ingest] Timed out: {label}")
+        sys.exit(1)
+    if status["ingestionJob"]["status"] == "FAILED":
+        reasons = status["ingestionJob"].get("failureReasons", ["unknown"])
+        print(f"[Ingest] FAILED {label}: {reasons}")
+        sys.exit(1)
+
+    stats = status["ingestionJob"].get("statistics", {})
+    print(f"[Ingest] COMPLETE {label}: {stats}")
+
+
+def _cached_data_source(bedrock_agent, kb_id: str, ds_id: str, name: str) -> bool:
+    try:
+        ds = bedrock_agent.get_data_source(knowledgeBaseId=kb_id, dataSourceId=ds_id)["dataSource"]
+    except ClientError as e:
+        if _is_not_found(e):
+            return False
+        raise
+    return ds["name"] == name and ds.get("status") != "DELETING"
+
+
+def _list_data_sources(bedrock_agent, kb_id: str, names: set[str]) -> dict[str, str]:
+    """Map the wanted data source names to IDs, stopping once every name is found."""
+    found: dict[str, str] = {}
+    paginator = bedrock_agent.get_paginator("list_data_sources")
+    pages = paginator.paginate(knowledgeBaseId=kb_id, PaginationConfig={"PageSize": 100})
+    for page in pages:
+        for ds in page.get("dataSourceSummaries", []):
+            if ds["name"] in names:
+                found[ds["name"]] = ds["dataSourceId"]
+        if len(found) == len(names):
+            break
+    return found
+
+
+def _delete_legacy_data_source(bedrock_agent, kb_id: str, ds_id: str) -> None:
+    """Drop the old single data source over policies/, whose chunks duplicate the per-payer ones."""
+    print(f"[DS] Deleting legacy data source {DATA_SOURCE_NAME} ({ds_id})...")
+    try:
+        bedrock_agent.delete_data_source(knowledgeBaseId=kb_id, dataSourceId=ds_id)
+    except ClientError as e:
+        if not _is_not_found(e):
+            raise
+
+
+def create_data_source_and_ingest(
+    bedrock_agent,
+    kb_id: str,
+    cached_ids: dict[str, str] | None = None,
+    uploads: Future[int] | None = None,
+    legacy_removed: bool = False,
+) -> dict[str, str]:
+    cached_ids = cached_ids or {}
+    existing_ids: dict[str, str] | None = None
+
+    # One data source per payer prefix keeps each payer's documents separately
+    # re-ingestable; the old single data source is removed once.
+    data_sources: dict[str, str] = {}
+    names = {group: f"{DATA_SOURCE_NAME}-{group}" for group in _policy_doc_groups()}
+    if not legacy_removed:
+        existing_ids = _list_data_sources(
+            bedrock_agent, kb_id, {*names.values(), DATA_SOURCE_NAME}
         )
-        state = status["ingestionJob"]["status"]
-        if state == "COMPLETE":
-            stats = status["ingestionJob"].get("statistics", {})
-            print(f"[Ingest] COMPLETE: {stats}")
-            return
-        if state == "FAILED":
-            reasons = status["ingestionJob"].get("failureReasons", ["unknown"])
-            print(f"[Ingest] FAILED: {reasons}")
-            sys.exit(1)
-        print(f"  Ingestion: {state}, waiting...")
-        time.sleep(5)
-
-    print("[Ingest] Timed out")
-    sys.exit(1)
-
-
-def save_config(kb_id: str) -> None:
-    config = {"knowledge_base_id": kb_id, "region": REGION}
+        legacy_id = existing_ids.get(DATA_SOURCE_NAME)
+        if legacy_id is not None:
+            _delete_legacy_data_source(bedrock_agent, kb_id, legacy_id)
+    for group, name in names.items():
+        ds_id = cached_ids.get(name)
+        if ds_id is not None and not _cached_data_source(bedrock_agent, kb_id, ds_id, name):
+            ds_id = None
+        if ds_id is None:
+            # List the KB's data sources at most once, and only when a cached ID misses.
+            if existing_ids is None:
+                existing_ids = _list_data_sources(bedrock_agent, kb_id, set(names.values()))
+            ds_id = existing_ids.get(name)
+        if ds_id is not None:
+            print(f"[DS] Already exists: {name} ({ds_id})")
+        else:
+            ds_id = _create_data_source(bedrock_agent, kb_id, name, f"policies/{group}/")
+        data_sources[name] = ds_id
+
+    # An ingestion job only sees objects that exist when it starts, so this is
+    # the last point at which the upload can be left running.
+    if uploads is not None:
+        print(f"Uploaded {uploads.result()} policy documents\n")
+
+    if not data_sources:
+        print("[Ingest] No policy documents to ingest")
+        return data_sources
+
+    # Bedrock allows one ingestion job per knowledge base at a time.
+    for name, ds_id in data_sources.items():
+        _run_ingestion_job(bedrock_agent, kb_id, ds_id, name)
+    return data_sources
+
+
+def load_config() -> dict[str, Any]:
+    """Return kb_config.json from a previous run, or {} when missing, unreadable, or for another region."""
+    if not CONFIG_PATH.exists():
+        return {}
+    try:
+        config = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(config, dict) or config.get("region") != REGION:
+        return {}
+    return config
+
+
+def save_config(kb_id: str, **cached: Any) -> None:
+    """Persist the KB ID plus resolved AWS identifiers so re-runs can skip lookups."""
+    config = {"knowledge_base_id": kb_id, "region": REGION, **cached}
     CONFIG_PATH.write_text(json.dumps(config, indent=2), encoding="utf-8")
     print(f"\nSaved config to: {CONFIG_PATH}")
     print(f"Set env var:  export BEDROCK_KB_ID={kb_id}")
 
 
 def main() -> None:
-    account_id = get_account_id()
+    # Delete kb_config.json to force every AWS resource to be re-checked.
+    cached = load_config()
+    # One session shares credential resolution and the service-model loader across clients.
+    session = boto3.session.Session(region_name=REGION)
+    # Cached IDs belong to the account that wrote them; other credentials start fresh.
+    fingerprint = credentials_fingerprint(session)
+    if cached.get("credentials_fingerprint") != fingerprint:
+        cached = {}
+    account_id = get_account_id(session, cached.get("account_id"))
     print(f"Account: {account_id} | Region: {REGION}\n")
 
-    s3 = boto3.client("s3", region_name=REGION)
-    iam = boto3.client("iam", region_name=REGION)
-    aoss = boto3.client("opensearchserverless", region_name=REGION)
-    bedrock_agent = boto3.client("bedrock-agent", region_name=REGION)
-
-    # Step 1: S3
-    create_s3_bucket(s3)
-    count = upload_policy_docs(s3)
-    print(f"Uploaded {count} policy documents\n")
-
-    # Step 2: IAM
-    role_arn = create_iam_role(iam)
+    s3 = session.client("s3", config=CLIENT_CONFIG)
+    iam = session.client("iam", config=CLIENT_CONFIG)
+    aoss = session.client("opensearchserverless", config=CLIENT_CONFIG)
+    bedrock_agent = session.client("bedrock-agent", config=CLIENT_CONFIG)
+
+    # Steps 1-3 are independent; run them together so the IAM propagation wait
+    # and the S3 uploads overlap with AOSS collection polling. The upload is not
+    # awaited until ingestion, so it also overlaps index and KB creation.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # Step 1: S3
+        docs_future = executor.submit(
+            _sync_policy_docs, s3, bool(cached.get("legacy_layout_removed"))
+        )
+        # Step 2: IAM
+        role_future = executor.submit(
+            create_iam_role,
+            iam,
+            cached.get("role_arn"),
+            cached.get("policy_sha256"),
+        )
+        # Step 3: OpenSearch Serverless
+        collection_future = executor.submit(
+            create_opensearch_collection,
+            aoss,
+            cached.get("collection_arn"),
+            cached.get("collection_endpoint"),
+        )
 
-    # Step 3: OpenSearch Serverless
-    collection_arn, collection_endpoint = create_opensearch_collection(aoss)
+        role_arn, policy_sha256 = role_future.result()
+        collection_arn, collection_endpoint = collection_future.result()
 
-    # Step 3b: Create vector index in the collection
-    create_vector_index(collection_endpoint)
+        # Step 3b: Create vector index in the collection
+        create_vector_index(session, collection_endpoint)
 
-    # Step 4: Bedrock KB
-    kb_id = create_knowledge_base(bedrock_agent, role_arn, collection_arn)
+        # Step 4: Bedrock KB
+        kb_id = create_knowledge_base(
+            bedrock_agent, role_arn, collection_arn, cached.get("knowledge_base_id")
+        )
 
-    # Step 5: Data source + ingestion
-    create_data_source_and_ingest(bedrock_agent, kb_id)
+        # Step 5: Data source + ingestion (waits for the S3 upload before ingesting)
+        same_kb = kb_id == cached.get("knowledge_base_id")
+        data_source_ids = create_data_source_and_ingest(
+            bedrock_agent,
+            kb_id,
+            cached.get("data_source_ids") if same_kb else None,
+            uploads=docs_future,
+            legacy_removed=same_kb and bool(cached.get("legacy_layout_removed")),
+        )
 
     # Step 6: Save config
-    save_config(kb_id)
+    save_config(
+        kb_id,
+        account_id=account_id,
+        credentials_fingerprint=fingerprint,
+        role_arn=role_arn,
+        collection_arn=collection_arn,
+        collection_endpoint=collection_endpoint,
+        policy_sha256=policy_sha256,
+        data_source_ids=data_source_ids,
+        legacy_layout_removed=True,
+    )
     print(f"\nDone! Knowledge Base ID: {kb_id}")
 
 
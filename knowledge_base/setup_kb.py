@@ -2,7 +2,14 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 from pathlib import Path
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback when orjson is absent.
+    orjson = None  # type: ignore[assignment]
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_POLICIES_PATH = BASE_DIR / "policies.json"
@@ -95,14 +102,70 @@ DEFAULT_POLICIES = [
 ]
 
 
+def _serialize_json(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(value, indent=2) + "\n").encode("utf-8")
+
+
+def _write_atomic(destination: Path, payload: bytes) -> None:
+    # Write beside the destination and swap in, so an interrupted run never leaves a partial file.
+    tmp_path = destination.with_suffix(destination.suffix + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, destination)
+
+
+def policy_index_path(policies_path: Path) -> Path:
+    """Companion index location for a policy store (policies.json -> policies_index.json)."""
+    return policies_path.with_name(f"{policies_path.stem}_index.json")
+
+
+def build_policy_index(policies: list[dict[str, Any]]) -> dict[str, dict[str, list[str]]]:
+    """
+    Invert the policy list into lookup tables keyed by what the matcher sees.
+
+    Member prefixes are uppercased and service keywords lowercased, matching
+    how the retrieval agent normalizes its inputs. Each key maps to the
+    policy IDs that declare it, in policy order.
+    """
+    index: dict[str, dict[str, list[str]]] = {"by_prefix": {}, "by_cpt": {}, "keywords": {}}
+    for policy in policies:
+        policy_id = policy["policy_id"]
+        entries = (
+            ("by_prefix", [prefix.upper() for prefix in policy.get("member_prefixes", [])]),
+            ("by_cpt", list(policy.get("procedure_codes", []))),
+            ("keywords", [keyword.lower() for keyword in policy.get("service_keywords", [])]),
+        )
+        for table, keys in entries:
+            for key in keys:
+                policy_ids = index[table].setdefault(key, [])
+                if policy_id not in policy_ids:
+                    policy_ids.append(policy_id)
+    return index
+
+
+# DEFAULT_POLICIES never changes at runtime, so serialize it once per process.
+_SERIALIZED_DEFAULT_POLICIES = _serialize_json(DEFAULT_POLICIES)
+_SERIALIZED_DEFAULT_POLICY_INDEX = _serialize_json(build_policy_index(DEFAULT_POLICIES))
+
+
 def bootstrap_local_policy_store(
     destination: Path = DEFAULT_POLICIES_PATH, overwrite: bool = False
 ) -> Path:
     destination.parent.mkdir(parents=True, exist_ok=True)
+    index_destination = policy_index_path(destination)
     if destination.exists() and not overwrite:
+        if not index_destination.exists():
+            try:
+                policies = json.loads(destination.read_text(encoding="utf-8"))
+                _write_atomic(index_destination, _serialize_json(build_policy_index(policies)))
+            except (OSError, json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                # The retrieval agent rebuilds the index in memory when the file is absent.
+                pass
         return destination
 
-    destination.write_text(json.dumps(DEFAULT_POLICIES, indent=2), encoding="utf-8")
+    _write_atomic(destination, _SERIALIZED_DEFAULT_POLICIES)
+    _write_atomic(index_destination, _SERIALIZED_DEFAULT_POLICY_INDEX)
     return destination
 
 
@@ -5,10 +5,6 @@ import json
 import logging
 import os
 
-from agents.browser_agent import BrowserAutomationAgent
-from agents.orchestrator_factory import create_runtime_orchestrator, orchestrator_mode
-from knowledge_base.setup_kb import bootstrap_local_policy_store
-
 DEFAULT_TRANSCRIPT = (
     "I need a prior auth for Jane Doe, date of birth March 15 1965, "
     "member ID UHC-4429871. She needs an MRI of the lumbar spine, outpatient, "
@@ -17,9 +13,9 @@ DEFAULT_TRANSCRIPT = (
 )
 
 
-def _configure_otel_console_exporter() -> None:
-    """Optional local OTel setup for CLI runs."""
-    enabled = os.getenv("ENABLE_OTEL_CONSOLE", "1").lower() in {"1", "true", "yes"}
+def _configure_otel_console_exporter(force: bool = False) -> None:
+    """Optional local OTel setup for CLI runs (opt-in via --enable-otel or ENABLE_OTEL_CONSOLE=1)."""
+    enabled = force or os.getenv("ENABLE_OTEL_CONSOLE", "0").lower() in {"1", "true", "yes"}
     if not enabled:
         return
 
@@ -27,6 +23,7 @@ def _configure_otel_console_exporter() -> None:
         from opentelemetry import trace
         from opentelemetry.sdk.trace import TracerProvider
         from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
     except Exception as exc:
         logging.getLogger(__name__).warning("OpenTelemetry console export is unavailable: %s", exc)
         return
@@ -35,8 +32,16 @@ def _configure_otel_console_exporter() -> None:
     if isinstance(current_provider, TracerProvider):
         return
 
-    provider = TracerProvider()
-    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    sample_ratio = float(os.getenv("OTEL_SAMPLE_RATIO", "0.1"))
+    provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(sample_ratio)))
+    provider.add_span_processor(
+        BatchSpanProcessor(
+            ConsoleSpanExporter(),
+            max_queue_size=512,
+            max_export_batch_size=64,
+            schedule_delay_millis=5000,
+        )
+    )
     trace.set_tracer_provider(provider)
 
 
@@ -59,12 +64,23 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Auto-approve HITL step and submit immediately.",
     )
+    parser.add_argument(
+        "--enable-otel",
+        action="store_true",
+        help="Export sampled OpenTelemetry spans to the console.",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
-    _configure_otel_console_exporter()
     args = parse_args()
+    _configure_otel_console_exporter(force=args.enable_otel)
+
+    # Deferred so --help and argument errors skip the boto3/agent import cost.
+    from agents.browser_agent import BrowserAutomationAgent
+    from agents.orchestrator_factory import create_runtime_orchestrator, orchestrator_mode
+    from knowledge_base.setup_kb import bootstrap_local_policy_store
+
     bootstrap_local_policy_store()
 
     browser_agent = BrowserAutomationAgent(portal_base_url=args.portal_url)
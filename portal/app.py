@@ -1,17 +1,30 @@
 from __future__ import annotations
 
+import atexit
+import functools
+import heapq
+import json
 import logging
 import os
 import queue
+import secrets
 import sys
 import threading
-import uuid
-from copy import deepcopy
-from datetime import datetime, timezone
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Any, Callable
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping
 
 from flask import Flask, Response, jsonify, render_template, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback when orjson is absent.
+    orjson = None  # type: ignore[assignment]
 
 # Ensure imports work when running `python portal/app.py` from project root.
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -19,23 +32,56 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from agents.browser_agent import BrowserAutomationAgent
-from agents.orchestrator_factory import create_runtime_orchestrator, orchestrator_mode
+from agents.orchestrator_factory import (
+    OrchestratorType,
+    create_runtime_orchestrator,
+    orchestrator_mode,
+)
+from agents.reasoning_agent import ClinicalReasoningAgent
 from agents.retrieval_agent import PayerPolicyRetrievalAgent
 from agents.types import WorkflowTraceStep
 from knowledge_base.setup_kb import bootstrap_local_policy_store
 
+__all__ = ["DEFAULT_TRANSCRIPT", "TERMINAL_STATUSES", "app"]
+
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder="templates")
 
 
+class _OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify/get_json backed by orjson. Keys stay sorted as with the default
+    provider; arguments orjson has no equivalent for fall back to stdlib json.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if kwargs.pop("indent", None):
+            option |= orjson.OPT_INDENT_2
+        kwargs.pop("separators", None)  # orjson output is always compact
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+if orjson is not None:
+    app.json = _OrjsonProvider(app)
+
+
 def _configure_otel_console_exporter() -> None:
     """
     Optional local OTel setup for demo visibility.
 
-    Set ENABLE_OTEL_CONSOLE=0 to disable console span export.
+    Set ENABLE_OTEL_CONSOLE=1 to enable console span export; OTEL_SAMPLE_RATIO
+    controls the fraction of traces exported.
     """
-    enabled = os.getenv("ENABLE_OTEL_CONSOLE", "1").lower() in {"1", "true", "yes"}
+    enabled = os.getenv("ENABLE_OTEL_CONSOLE", "0").lower() in {"1", "true", "yes"}
     if not enabled:
         return
 
@@ -43,6 +89,7 @@ def _configure_otel_console_exporter() -> None:
         from opentelemetry import trace
         from opentelemetry.sdk.trace import TracerProvider
         from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
     except Exception as exc:
         logger.warning("OpenTelemetry console export is unavailable: %s", exc)
         return
@@ -51,24 +98,173 @@ def _configure_otel_console_exporter() -> None:
     if isinstance(current_provider, TracerProvider):
         return
 
-    provider = TracerProvider()
-    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    sample_ratio = float(os.getenv("OTEL_SAMPLE_RATIO", "0.1"))
+    provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(sample_ratio)))
+    provider.add_span_processor(
+        BatchSpanProcessor(
+            ConsoleSpanExporter(),
+            max_queue_size=512,
+            max_export_batch_size=64,
+            schedule_delay_millis=5000,
+        )
+    )
     trace.set_tracer_provider(provider)
     logger.info("OpenTelemetry console exporter enabled.")
 
 
 _configure_otel_console_exporter()
 
-# Stores submitted PA requests in memory for demo purposes.
-submitted_requests: list[dict[str, Any]] = []
+# Stores submitted PA requests in memory for demo purposes. Only the most recent
+# MAX_SUBMITTED_REQUESTS are kept; submitted_count keeps numbering references.
+MAX_SUBMITTED_REQUESTS = 10_000
+submitted_requests: deque[dict[str, Any]] = deque(maxlen=MAX_SUBMITTED_REQUESTS)
+submitted_count = 0
+
+_PA_FIELDS = (
+    "patient_name",
+    "date_of_birth",
+    "member_id",
+    "payer_name",
+    "provider_npi",
+    "requested_service",
+    "facility_name",
+    "diagnosis_code",
+    "procedure_code",
+    "clinical_justification",
+    "policy_id",
+    "denial_risk_score",
+    "urgency",
+)
 
-# Stores workflow runs for the dashboard.
-workflow_runs: dict[str, dict[str, Any]] = {}
-workflow_run_order: list[str] = []
-workflow_streams: dict[str, list[queue.Queue[dict[str, Any]]]] = {}
-workflow_lock = threading.Lock()
+
+class RunState:
+    """
+    One workflow run. ``record`` is replaced wholesale under ``lock`` and never
+    mutated in place, so readers load it once without locking and always see a
+    consistent snapshot (trace steps are kept in a tuple for the same reason).
+    ``start_ns`` is the monotonic clock at creation, used for run durations;
+    it is set once, so a run resumed after approval reports its whole span.
+    ``summary_json`` caches the encoded summary, keyed by the summary object.
+    ``pending_steps`` holds trace steps waiting for the shared flusher thread
+    to publish them as one batch, with ``pending_record`` the record after the
+    last one; ``flush_scheduled`` is set while a flush is queued for the run.
+    """
+
+    __slots__ = (
+        "lock",
+        "record",
+        "start_ns",
+        "summary_json",
+        "pending_steps",
+        "pending_record",
+        "flush_scheduled",
+    )
+
+    def __init__(self, record: dict[str, Any], start_ns: int | None = None) -> None:
+        self.lock = threading.Lock()
+        self.record = record
+        self.start_ns = time.monotonic_ns() if start_ns is None else start_ns
+        self.summary_json: tuple[dict[str, Any], bytes] | None = None
+        self.pending_steps: list[dict[str, Any]] = []
+        self.pending_record: dict[str, Any] | None = None
+        self.flush_scheduled = False
+
+    def encoded_summary(self) -> bytes:
+        # Encoded on first read after each summary change; a racing reader at
+        # worst encodes the same summary twice.
+        summary = self.record["summary"]
+        cached = self.summary_json
+        if cached is None or cached[0] is not summary:
+            cached = (summary, _dumps(summary, sort_keys=True))
+            self.summary_json = cached
+        return cached[1]
+
+
+class _EventLog:
+    """
+    The recent SSE events of one run, shared by all of its subscribers. The
+    serializer appends each encoded event once, whatever the fanout, and
+    subscribers wake on the condition and read everything past the sequence
+    number they last saw. Only the newest SSE_EVENT_LOG_SIZE events are kept;
+    a subscriber that falls further behind is told how many it missed so it
+    can re-sync from /api/runs/<id>. Under a gevent worker threading is
+    monkey-patched, so idle subscribers wait cooperatively instead of pinning
+    an OS thread.
+    """
+
+    __slots__ = ("events", "condition", "seq", "subscribers")
+
+    def __init__(self) -> None:
+        self.events: deque[tuple[int, str, bytes]] = deque(maxlen=SSE_EVENT_LOG_SIZE)
+        self.condition = threading.Condition()
+        self.seq = 0
+        self.subscribers = 0
+
+    def append(self, event_type: str, body: bytes) -> None:
+        with self.condition:
+            self.seq += 1
+            self.events.append((self.seq, event_type, body))
+            self.condition.notify_all()
+
+    def cursor(self) -> int:
+        with self.condition:
+            return self.seq
+
+    def read_after(
+        self, last_seen: int, timeout: float | None = None
+    ) -> tuple[int, list[tuple[str, bytes]], int]:
+        """
+        Wait up to ``timeout`` for events newer than ``last_seen``. Returns
+        (dropped_count, events, new_last_seen); events is empty on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > last_seen, timeout):
+                return 0, [], last_seen
+            unread = self.seq - last_seen
+            start = max(0, len(self.events) - unread)
+            fresh = [(event_type, body) for _, event_type, body in islice(self.events, start, None)]
+            return unread - len(fresh), fresh, self.seq
+
+
+# Stores workflow runs for the dashboard in creation order, oldest first.
+# workflow_lock only guards inserting, evicting and iterating runs, event log
+# creation and subscriber counts, and submitted_requests; per-run writes take
+# the run's own lock. The publish path reads workflow_streams without locking;
+# each _EventLog synchronizes its own events.
 MAX_WORKFLOW_RUNS = 100
-TERMINAL_STATUSES = {"completed", "failed"}
+workflow_runs: OrderedDict[str, RunState] = OrderedDict()
+workflow_streams: dict[str, _EventLog] = {}
+workflow_lock = threading.Lock()
+SSE_EVENT_LOG_SIZE = 128
+# An idle SSE stream sends a comment ping this often so proxies keep it open.
+SSE_PING_INTERVAL_S = 20
+# Trace steps arriving within this window are published as one trace_batch event.
+TRACE_BATCH_WINDOW_S = 0.02
+# Run statuses, interned once so status checks compare the same objects.
+_QUEUED = sys.intern("queued")
+_RUNNING = sys.intern("running")
+_COMPLETED = sys.intern("completed")
+_FAILED = sys.intern("failed")
+TERMINAL_STATUSES = frozenset({_COMPLETED, _FAILED})
+
+# Runs execute on a fixed worker pool. Runs waiting for a worker are counted,
+# and new runs are refused with 503 once PA_MAX_QUEUED are waiting.
+PA_WORKERS = int(os.getenv("PA_WORKERS", "8"))
+PA_MAX_QUEUED = int(os.getenv("PA_MAX_QUEUED", "32"))
+_run_executor = ThreadPoolExecutor(max_workers=PA_WORKERS, thread_name_prefix="pa-run")
+atexit.register(_run_executor.shutdown, wait=False, cancel_futures=True)
+_queued_runs = 0
+_queued_runs_lock = threading.Lock()
+
+# Admission control in front of the pool: reserved runs wait in _pending_runs
+# and are handed to a worker only while fewer than _inflight_cap are active, so
+# no worker thread blocks on the cap. The cap defaults to PA_WORKERS and never
+# exceeds it; PUT /api/config (PA_ADMIN_TOKEN required) resizes it at runtime.
+_inflight_cap = min(int(os.getenv("PA_MAX_INFLIGHT", str(PA_WORKERS))), PA_WORKERS)
+_inflight_active = 0
+_pending_runs: deque[Callable[[], None]] = deque()
+_admission = threading.Lock()
+PA_ADMIN_TOKEN = os.getenv("PA_ADMIN_TOKEN", "")
 
 DEFAULT_TRANSCRIPT = (
     "I need a prior auth for Jane Doe, date of birth March 15 1965, "
@@ -78,21 +274,30 @@ DEFAULT_TRANSCRIPT = (
 )
 
 
-def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+_iso_second: tuple[int, str] = (-1, "")
 
 
-def _trace_duration_ms(trace: list[dict[str, Any]]) -> int | None:
-    if len(trace) < 2:
-        return None
-    try:
-        start = datetime.fromisoformat(
-            str(trace[0]["timestamp"]).replace("Z", "+00:00"))
-        end = datetime.fromisoformat(
-            str(trace[-1]["timestamp"]).replace("Z", "+00:00"))
-    except (ValueError, KeyError, TypeError):
+def _utc_now_iso() -> str:
+    # Same shape as datetime.isoformat() with a Z suffix, but always with
+    # microseconds. The seconds prefix is formatted once per wall-clock second.
+    global _iso_second
+    seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_seconds, prefix = _iso_second
+    if cached_seconds != seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _iso_second = (seconds, prefix)
+    return f"{prefix}.{micros:06d}Z"
+
+
+def _trace_duration_ms(trace: tuple[dict[str, Any], ...], start_ns: int | None) -> int | None:
+    # Monotonic elapsed time since the run was created; the ISO timestamps on
+    # trace steps are for display only and are not re-parsed here.
+    if len(trace) < 2 or start_ns is None:
         return None
-    return max(int((end - start).total_seconds() * 1000), 0)
+    return max((time.monotonic_ns() - start_ns) // 1_000_000, 0)
+
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
 
 
 def _summarize_run(
@@ -100,48 +305,166 @@ def _summarize_run(
     result: dict[str, Any],
     run_status: str,
     error: str | None = None,
+    start_ns: int | None = None,
 ) -> dict[str, Any]:
-    coding = result.get("coding") or {}
-    necessity = result.get("necessity") or {}
-    submission = result.get("submission") or {}
-    trace = result.get("trace") or []
+    result_get = result.get
+    coding = result_get("coding") or _EMPTY
+    necessity = result_get("necessity") or _EMPTY
+    submission = result_get("submission") or _EMPTY
+    trace = result_get("trace") or ()
     return {
         "id": run_id,
         "run_status": run_status,
-        "next_action": result.get("next_action", ""),
+        "next_action": result_get("next_action", ""),
         "coding_source": coding.get("source"),
         "diagnosis_code": coding.get("diagnosis_code"),
         "procedure_code": coding.get("procedure_code"),
         "denial_risk_score": necessity.get("denial_risk_score"),
         "submission_status": submission.get("status"),
         "submission_reference": submission.get("reference"),
-        "browser_mode": result.get("browser_mode"),
-        "orchestrator_mode": result.get("orchestrator_mode"),
-        "retrieval_source": result.get("retrieval_source"),
-        "duration_ms": _trace_duration_ms(trace),
+        "browser_mode": result_get("browser_mode"),
+        "orchestrator_mode": result_get("orchestrator_mode"),
+        "retrieval_source": result_get("retrieval_source"),
+        "duration_ms": _trace_duration_ms(trace, start_ns),
         "trace_steps": len(trace),
         "error": error,
     }
 
 
+def _apply_trace_delta(
+    summary: dict[str, Any], trace_steps: int, duration_ms: int | None
+) -> dict[str, Any]:
+    # A trace step only moves these two fields; everything else in the summary
+    # comes from the final result or a status change.
+    return {**summary, "trace_steps": trace_steps, "duration_ms": duration_ms}
+
+
 def _record_snapshot(run_id: str) -> dict[str, Any] | None:
-    with workflow_lock:
-        record = workflow_runs.get(run_id)
-        if record is None:
-            return None
-        return deepcopy(record)
+    state = workflow_runs.get(run_id)
+    return None if state is None else state.record
 
 
-def _publish_event(run_id: str, event_type: str) -> None:
-    snapshot = _record_snapshot(run_id)
-    if snapshot is None:
+_SUMMARY_INPUTS = ("result", "status", "error")
+
+
+def _next_record(state: RunState, **changes: Any) -> dict[str, Any]:
+    """
+    Return a copy of the run's record with changes applied and updated_at refreshed.
+
+    The record's summary doubles as the summary cache: it is rebuilt only when
+    one of its inputs actually changed and is otherwise shared by reference.
+    Callers that already patched the summary pass it in ``changes``.
+    """
+    record = state.record
+    updated = {**record, **changes, "updated_at": _utc_now_iso()}
+    if "summary" not in changes and any(updated[key] is not record[key] for key in _SUMMARY_INPUTS):
+        updated["summary"] = _summarize_run(
+            run_id=updated["id"],
+            result=updated["result"],
+            run_status=updated["status"],
+            error=updated["error"],
+            start_ns=state.start_ns,
+        )
+    return updated
+
+
+def _update_run(run_id: str, **changes: Any) -> bool:
+    state = workflow_runs.get(run_id)
+    if state is None:
+        return False
+    with state.lock:
+        state.record = _next_record(state, **changes)
+    return True
+
+
+def _publish_event(
+    run_id: str,
+    event_type: str,
+    steps: list[dict[str, Any]] | None = None,
+    record: dict[str, Any] | None = None,
+) -> None:
+    """
+    Append an event to the run's SSE event log, serialized once for all subscribers.
+
+    Trace batches carry only the new ``steps`` plus the summary as of the last
+    of them; status events carry the full current record and first flush any
+    pending steps so subscribers see them in order. Records are immutable once
+    published, so encoding is left to the serializer thread without locking
+    or copying; its single FIFO queue keeps events in publish order.
+    """
+    if steps is None:
+        _flush_trace_batch(run_id)
+    state = workflow_runs.get(run_id)
+    log = workflow_streams.get(run_id)
+    if state is None or log is None:
         return
+    if record is None:
+        record = state.record
+    if steps is None:
+        payload: dict[str, Any] = {"type": event_type, "record": record}
+    else:
+        payload = {
+            "type": event_type,
+            "record_id": run_id,
+            "status": record["status"],
+            "summary": record["summary"],
+            "steps": steps,
+        }
+    _serialize_queue.put((event_type, log, payload))
 
-    event = {"type": event_type, "record": snapshot}
-    with workflow_lock:
-        listeners = list(workflow_streams.get(run_id, []))
-    for listener in listeners:
-        listener.put(event)
+
+# Read once at import; tests assign these directly instead of patching os.environ.
+USE_NOVA_REASONING = os.getenv("USE_NOVA_REASONING", "1").lower() in {"1", "true", "yes"}
+USE_NOVA_JUSTIFICATION = os.getenv(
+    "USE_NOVA_JUSTIFICATION", "1" if USE_NOVA_REASONING else "0"
+).lower() in {"1", "true", "yes"}
+
+_policy_store_ready = threading.Event()
+_agent_pool_lock = threading.Lock()
+
+
+def _ensure_policy_store() -> None:
+    if not _policy_store_ready.is_set():
+        bootstrap_local_policy_store(overwrite=False)
+        _policy_store_ready.set()
+
+
+@functools.lru_cache(maxsize=8)
+def _build_agents(
+    portal_url: str, testing: bool, use_reasoning: bool, use_justification: bool
+) -> tuple[BrowserAutomationAgent, PayerPolicyRetrievalAgent, OrchestratorType]:
+    browser_agent = BrowserAutomationAgent(portal_base_url=portal_url)
+    retrieval_agent = PayerPolicyRetrievalAgent(kb_id="") if testing else PayerPolicyRetrievalAgent()
+    # Built once here so no run's policy_retrieval step pays for it.
+    retrieval_agent.warm_up()
+    orchestrator = create_runtime_orchestrator(
+        browser_agent=browser_agent,
+        retrieval_agent=retrieval_agent,
+        reasoning_agent=ClinicalReasoningAgent(
+            use_model=use_reasoning,
+            use_model_justification=use_justification,
+        ),
+    )
+    return browser_agent, retrieval_agent, orchestrator
+
+
+def _get_agents(
+    portal_url: str,
+) -> tuple[BrowserAutomationAgent, PayerPolicyRetrievalAgent, OrchestratorType]:
+    """
+    Agents and orchestrator shared by every run against the same portal URL.
+
+    They hold configuration and lazily created clients only; each run's state
+    lives in orchestrator.run()'s locals. The lock keeps two first runs from
+    building the same bundle twice.
+    """
+    with _agent_pool_lock:
+        return _build_agents(
+            portal_url,
+            bool(app.config.get("TESTING")),
+            USE_NOVA_REASONING,
+            USE_NOVA_JUSTIFICATION,
+        )
 
 
 def _execute_workflow(
@@ -151,17 +474,8 @@ def _execute_workflow(
     reviewer_approved: bool | None = None,
     trace_hook: Callable[[WorkflowTraceStep], None] | None = None,
 ) -> dict[str, Any]:
-    bootstrap_local_policy_store(overwrite=False)
-    browser_agent = BrowserAutomationAgent(portal_base_url=portal_url)
-    retrieval_agent = (
-        PayerPolicyRetrievalAgent(kb_id="")
-        if app.config.get("TESTING")
-        else PayerPolicyRetrievalAgent()
-    )
-    orchestrator = create_runtime_orchestrator(
-        browser_agent=browser_agent,
-        retrieval_agent=retrieval_agent,
-    )
+    _ensure_policy_store()
+    browser_agent, retrieval_agent, orchestrator = _get_agents(portal_url)
     result = orchestrator.run(
         transcript=transcript,
         auto_approve=auto_approve,
@@ -182,18 +496,8 @@ def _run_workflow_async(
     portal_url: str,
     reviewer_approved: bool | None = None,
 ) -> None:
-    with workflow_lock:
-        record = workflow_runs.get(run_id)
-        if record is None:
-            return
-        record["status"] = "running"
-        record["updated_at"] = _utc_now_iso()
-        record["summary"] = _summarize_run(
-            run_id=run_id,
-            result=record.get("result", {}),
-            run_status="running",
-            error=record.get("error"),
-        )
+    if not _update_run(run_id, status=_RUNNING):
+        return
     _publish_event(run_id, "run_started")
 
     def trace_hook(step: WorkflowTraceStep) -> None:
@@ -207,57 +511,88 @@ def _run_workflow_async(
             reviewer_approved=reviewer_approved,
             trace_hook=trace_hook,
         )
-        with workflow_lock:
-            record = workflow_runs.get(run_id)
-            if record is None:
-                return
-            record["result"] = result_dict
-            record["status"] = "completed"
-            record["updated_at"] = _utc_now_iso()
-            record["summary"] = _summarize_run(
-                run_id=run_id,
-                result=result_dict,
-                run_status="completed",
-                error=None,
-            )
-            record["error"] = None
+        result_dict["trace"] = tuple(result_dict.get("trace") or ())
+        if not _update_run(run_id, result=result_dict, status=_COMPLETED, error=None):
+            return
         _publish_event(run_id, "run_completed")
     except Exception as exc:
-        with workflow_lock:
-            record = workflow_runs.get(run_id)
-            if record is None:
-                return
-            record["status"] = "failed"
-            record["updated_at"] = _utc_now_iso()
-            record["error"] = str(exc)
-            result = record.setdefault("result", {"trace": []})
-            record["summary"] = _summarize_run(
-                run_id=run_id,
-                result=result,
-                run_status="failed",
-                error=str(exc),
-            )
+        if not _update_run(run_id, status=_FAILED, error=str(exc)):
+            return
         _publish_event(run_id, "run_failed")
     finally:
         _publish_event(run_id, "terminal")
 
 
 def _record_trace_step(run_id: str, step: WorkflowTraceStep) -> None:
-    with workflow_lock:
-        record = workflow_runs.get(run_id)
-        if record is None:
-            return
-        result = record.setdefault("result", {"trace": []})
-        trace = result.setdefault("trace", [])
-        trace.append(step.to_dict())
-        record["updated_at"] = _utc_now_iso()
-        record["summary"] = _summarize_run(
-            run_id=run_id,
-            result=result,
-            run_status=record.get("status", "running"),
-            error=record.get("error"),
+    state = workflow_runs.get(run_id)
+    if state is None:
+        return
+    step_dict = step.to_dict()
+    with state.lock:
+        record = state.record
+        result = record["result"]
+        trace = (*result.get("trace", ()), step_dict)
+        state.record = _next_record(
+            state,
+            result={**result, "trace": trace},
+            summary=_apply_trace_delta(
+                record["summary"], len(trace), _trace_duration_ms(trace, state.start_ns)
+            ),
         )
-    _publish_event(run_id, "trace")
+        state.pending_steps.append(step_dict)
+        state.pending_record = state.record
+        if not state.flush_scheduled:
+            state.flush_scheduled = True
+            _schedule_trace_flush(run_id)
+
+
+# One daemon flushes every run's trace batches: runs queue (deadline, run_id)
+# here and the thread sleeps until the earliest deadline. A flush that finds
+# the batch already published (e.g. by a status event) does nothing.
+_flush_deadlines: list[tuple[float, str]] = []
+_flush_condition = threading.Condition()
+
+
+def _schedule_trace_flush(run_id: str) -> None:
+    with _flush_condition:
+        heapq.heappush(_flush_deadlines, (time.monotonic() + TRACE_BATCH_WINDOW_S, run_id))
+        _flush_condition.notify()
+
+
+def _flush_due_trace_batches() -> None:
+    while True:
+        with _flush_condition:
+            while True:
+                if not _flush_deadlines:
+                    _flush_condition.wait()
+                    continue
+                delay = _flush_deadlines[0][0] - time.monotonic()
+                if delay <= 0:
+                    break
+                _flush_condition.wait(delay)
+            _, run_id = heapq.heappop(_flush_deadlines)
+        try:
+            _flush_trace_batch(run_id)
+        except Exception:  # pragma: no cover - keep flushing other runs.
+            logger.exception("Failed to flush trace batch for %s", run_id)
+
+
+def _flush_trace_batch(run_id: str) -> None:
+    state = workflow_runs.get(run_id)
+    if state is None:
+        return
+    # Published under the run lock so a status event flushing concurrently
+    # cannot overtake the batch; queueing for the serializer never blocks.
+    with state.lock:
+        state.flush_scheduled = False
+        if not state.pending_steps:
+            return
+        steps, state.pending_steps = state.pending_steps, []
+        record, state.pending_record = state.pending_record, None
+        _publish_event(run_id, "trace_batch", steps=steps, record=record)
+
+
+threading.Thread(target=_flush_due_trace_batches, name="pa-trace-flusher", daemon=True).start()
 
 
 def _run_cached_submission_async(
@@ -266,18 +601,8 @@ def _run_cached_submission_async(
     review_snapshot: str,
     portal_url: str,
 ) -> None:
-    with workflow_lock:
-        record = workflow_runs.get(run_id)
-        if record is None:
-            return
-        record["status"] = "running"
-        record["updated_at"] = _utc_now_iso()
-        record["summary"] = _summarize_run(
-            run_id=run_id,
-            result=record.get("result", {}),
-            run_status="running",
-            error=record.get("error"),
-        )
+    if not _update_run(run_id, status=_RUNNING):
+        return
     _publish_event(run_id, "run_started")
 
     try:
@@ -298,7 +623,7 @@ def _run_cached_submission_async(
             ),
         )
 
-        browser_agent = BrowserAutomationAgent(portal_base_url=portal_url)
+        browser_agent = _get_agents(portal_url)[0]
         submission = browser_agent.submit(
             payload=payload,
             approved=True,
@@ -336,48 +661,129 @@ def _run_cached_submission_async(
             )
             next_action = "retry_submission"
 
-        with workflow_lock:
-            record = workflow_runs.get(run_id)
-            if record is None:
-                return
-            result = record.setdefault("result", {"trace": []})
-            result["submission"] = submission.to_dict()
-            result["browser_mode"] = browser_agent.browser_mode
-            result["next_action"] = next_action
-            record["status"] = "completed"
-            record["updated_at"] = _utc_now_iso()
-            record["summary"] = _summarize_run(
-                run_id=run_id,
-                result=result,
-                run_status="completed",
-                error=None,
-            )
-            record["error"] = None
+        state = workflow_runs.get(run_id)
+        if state is None:
+            return
+        with state.lock:
+            record = state.record
+            result = {
+                **record["result"],
+                "submission": submission.to_dict(),
+                "browser_mode": browser_agent.browser_mode,
+                "next_action": next_action,
+            }
+            state.record = _next_record(state, result=result, status=_COMPLETED, error=None)
         _publish_event(run_id, "run_completed")
     except Exception as exc:
-        with workflow_lock:
-            record = workflow_runs.get(run_id)
-            if record is None:
-                return
-            record["status"] = "failed"
-            record["updated_at"] = _utc_now_iso()
-            record["error"] = str(exc)
-            result = record.setdefault("result", {"trace": []})
-            record["summary"] = _summarize_run(
-                run_id=run_id,
-                result=result,
-                run_status="failed",
-                error=str(exc),
-            )
+        if not _update_run(run_id, status=_FAILED, error=str(exc)):
+            return
         _publish_event(run_id, "run_failed")
     finally:
         _publish_event(run_id, "terminal")
 
 
-def _format_sse(event_type: str, payload: dict[str, Any]) -> str:
-    import json
+def _dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """
+    Compact JSON bytes for SSE payloads; orjson when installed. ``sort_keys``
+    matches jsonify's key order for bodies served next to jsonify responses.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(value, sort_keys=sort_keys).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def _sse_prefix(event_type: str) -> bytes:
+    return f"event: {event_type}\ndata: ".encode("utf-8")
+
+
+_SSE_SUFFIX = b"\n\n"
+
+
+def _reserve_run_slot() -> bool:
+    """Claim a place in the run queue, or return False when PA_MAX_QUEUED runs are waiting."""
+    global _queued_runs
+    with _queued_runs_lock:
+        if _queued_runs >= PA_MAX_QUEUED:
+            return False
+        _queued_runs += 1
+        return True
+
+
+def _dispatch_pending_runs() -> None:
+    """Hand queued runs to the pool while the in-flight cap allows. Caller holds _admission."""
+    global _inflight_active, _queued_runs
+    while _pending_runs and _inflight_active < _inflight_cap:
+        _inflight_active += 1
+        # A run counts as queued until it is admitted.
+        with _queued_runs_lock:
+            _queued_runs -= 1
+        _run_executor.submit(_pending_runs.popleft())
+
+
+def _submit_reserved_run(target: Callable[..., None], **kwargs: Any) -> None:
+    def run() -> None:
+        global _inflight_active
+        try:
+            target(**kwargs)
+        finally:
+            with _admission:
+                _inflight_active -= 1
+                _dispatch_pending_runs()
+
+    with _admission:
+        _pending_runs.append(run)
+        _dispatch_pending_runs()
+
+
+def _set_inflight_cap(cap: int) -> None:
+    global _inflight_cap
+    with _admission:
+        _inflight_cap = min(cap, PA_WORKERS)
+        _dispatch_pending_runs()
+
+
+def _server_busy_response() -> tuple[Response, int]:
+    response = jsonify({"error": "server_busy", "max_queued": PA_MAX_QUEUED})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def _format_sse(event_type: str, body: bytes) -> bytes:
+    return _sse_prefix(event_type) + body + _SSE_SUFFIX
+
 
-    return f"event: {event_type}\ndata: {json.dumps(payload)}\n\n"
+# SSE payloads are encoded off the workflow threads: _publish_event enqueues
+# (event_type, event log, payload) and this daemon encodes once and appends.
+_serialize_queue: queue.SimpleQueue[
+    tuple[str, _EventLog, dict[str, Any]]
+] = queue.SimpleQueue()
+
+
+def _serialize_events() -> None:
+    while True:
+        event_type, log, payload = _serialize_queue.get()
+        try:
+            body = _dumps(payload)
+        except Exception:  # pragma: no cover - records are plain JSON data.
+            logger.exception("Failed to encode %s event", event_type)
+            continue
+        log.append(event_type, body)
+
+
+threading.Thread(target=_serialize_events, name="pa-sse-serializer", daemon=True).start()
+
+
+def _sse_response(frames: Iterable[bytes]) -> Response:
+    return Response(
+        frames,
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
 
 @app.route("/")
@@ -398,24 +804,13 @@ def submit_pa():
     Receives a submitted PA form and stores it.
     Nova Act or API-run auto-approval path posts to this endpoint.
     """
-    data = {
-        "patient_name": request.form.get("patient_name"),
-        "date_of_birth": request.form.get("date_of_birth"),
-        "member_id": request.form.get("member_id"),
-        "payer_name": request.form.get("payer_name"),
-        "provider_npi": request.form.get("provider_npi"),
-        "requested_service": request.form.get("requested_service"),
-        "facility_name": request.form.get("facility_name"),
-        "diagnosis_code": request.form.get("diagnosis_code"),
-        "procedure_code": request.form.get("procedure_code"),
-        "clinical_justification": request.form.get("clinical_justification"),
-        "policy_id": request.form.get("policy_id"),
-        "denial_risk_score": request.form.get("denial_risk_score"),
-        "urgency": request.form.get("urgency"),
-    }
+    global submitted_count
+    form_get = request.form.get
+    data = {field: form_get(field) for field in _PA_FIELDS}
     with workflow_lock:
         submitted_requests.append(data)
-        reference = f"PA-{len(submitted_requests):04d}"
+        submitted_count += 1
+        reference = f"PA-{submitted_count:04d}"
         print(f"PA Request received: {data['patient_name']} - {data['procedure_code']}")
     return jsonify({"status": "submitted", "reference": reference})
 
@@ -423,8 +818,10 @@ def submit_pa():
 @app.route("/requests")
 def view_requests():
     """Simple admin view to see submitted PA requests."""
+    # Submitted entries are never modified after they are appended, so a
+    # shallow copy of the list is a consistent snapshot.
     with workflow_lock:
-        requests_snapshot = deepcopy(submitted_requests)
+        requests_snapshot = list(submitted_requests)
     return jsonify(requests_snapshot)
 
 
@@ -433,10 +830,12 @@ def list_runs():
     limit = request.args.get("limit", default=20, type=int)
     limit = max(1, min(limit, 100))
     with workflow_lock:
-        run_ids = list(reversed(workflow_run_order[-limit:]))
-        summaries = [deepcopy(workflow_runs[run_id]["summary"])
-                     for run_id in run_ids if run_id in workflow_runs]
-    return jsonify({"runs": summaries, "count": len(summaries)})
+        states = list(islice(reversed(workflow_runs.values()), limit))
+    # Summaries are pre-encoded with sorted keys, and "count" sorts before
+    # "runs", so the body has the same key order as a jsonify response.
+    summaries = [state.encoded_summary() for state in states]
+    body = b'{"count":%d,"runs":[' % len(summaries) + b",".join(summaries) + b"]}"
+    return Response(body, mimetype="application/json")
 
 
 @app.route("/api/runs/<run_id>", methods=["GET"])
@@ -449,48 +848,57 @@ def get_run(run_id: str):
 
 @app.route("/api/runs/<run_id>/events", methods=["GET"])
 def stream_run_events(run_id: str):
+    state = workflow_runs.get(run_id)
+    if state is None:
+        return jsonify({"error": "run_not_found"}), 404
+
+    # Finished runs (e.g. a dashboard reload) get snapshot + terminal without
+    # subscribing to the event log.
+    finished_record = state.record
+    if finished_record["status"] in TERMINAL_STATUSES:
+        finished_body = _dumps({"record": finished_record})
+        return _sse_response(
+            iter((_format_sse("snapshot", finished_body), _format_sse("terminal", finished_body)))
+        )
+
     with workflow_lock:
-        if run_id not in workflow_runs:
-            return jsonify({"error": "run_not_found"}), 404
-        listener: queue.Queue[dict[str, Any]] = queue.Queue()
-        workflow_streams.setdefault(run_id, []).append(listener)
-        initial = deepcopy(workflow_runs[run_id])
+        log = workflow_streams.get(run_id)
+        if log is None:
+            log = workflow_streams[run_id] = _EventLog()
+        log.subscribers += 1
+    last_seen = log.cursor()
+    # Loaded after subscribing, so no event published from here on is missed.
+    initial_record = state.record
+    initial_terminal = initial_record["status"] in TERMINAL_STATUSES
+    initial_body = _dumps({"record": initial_record})
 
     def generate():
+        nonlocal last_seen
         try:
-            yield _format_sse("snapshot", {"record": initial})
-            if initial.get("status") in TERMINAL_STATUSES:
-                yield _format_sse("terminal", {"record": initial})
+            yield _format_sse("snapshot", initial_body)
+            if initial_terminal:
+                yield _format_sse("terminal", initial_body)
                 return
 
             while True:
-                try:
-                    event = listener.get(timeout=20)
-                except queue.Empty:
-                    yield ": ping\n\n"
+                dropped, events, last_seen = log.read_after(last_seen, timeout=SSE_PING_INTERVAL_S)
+                if dropped:
+                    dropped_body = _dumps({"record_id": run_id, "dropped_count": dropped})
+                    yield _format_sse("dropped", dropped_body)
+                elif not events:
+                    yield b": ping\n\n"
                     continue
-
-                event_type = str(event.get("type", "update"))
-                yield _format_sse(event_type, event)
-                if event_type == "terminal":
-                    return
+                for event_type, body in events:
+                    yield _format_sse(event_type, body)
+                    if event_type == "terminal":
+                        return
         finally:
             with workflow_lock:
-                listeners = workflow_streams.get(run_id, [])
-                if listener in listeners:
-                    listeners.remove(listener)
-                if not listeners:
+                log.subscribers -= 1
+                if not log.subscribers and workflow_streams.get(run_id) is log:
                     workflow_streams.pop(run_id, None)
 
-    return Response(
-        stream_with_context(generate()),
-        mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    return _sse_response(stream_with_context(generate()))
 
 
 @app.route("/api/runs", methods=["POST"])
@@ -504,13 +912,16 @@ def create_run():
     portal_url = str(body.get("portal_url", "")
                      ).strip() or request.host_url.rstrip("/")
 
-    run_id = uuid.uuid4().hex[:12]
+    if not _reserve_run_slot():
+        return _server_busy_response()
+
+    run_id = secrets.token_hex(6)
     created_at = _utc_now_iso()
     record = {
         "id": run_id,
         "created_at": created_at,
         "updated_at": created_at,
-        "status": "queued",
+        "status": _QUEUED,
         "error": None,
         "request": {
             "transcript": transcript,
@@ -518,35 +929,29 @@ def create_run():
             "portal_url": portal_url,
             "reviewer_approved": None,
         },
-        "result": {"trace": []},
+        "result": {"trace": ()},
         "summary": _summarize_run(
             run_id=run_id,
-            result={"trace": []},
-            run_status="queued",
+            result={"trace": ()},
+            run_status=_QUEUED,
             error=None,
         ),
     }
 
     with workflow_lock:
-        workflow_runs[run_id] = record
-        workflow_run_order.append(run_id)
-        while len(workflow_run_order) > MAX_WORKFLOW_RUNS:
-            stale_run_id = workflow_run_order.pop(0)
-            workflow_runs.pop(stale_run_id, None)
+        if len(workflow_runs) >= MAX_WORKFLOW_RUNS:
+            stale_run_id, _ = workflow_runs.popitem(last=False)
             workflow_streams.pop(stale_run_id, None)
+        workflow_runs[run_id] = RunState(record)
 
-    worker = threading.Thread(
-        target=_run_workflow_async,
-        kwargs={
-            "run_id": run_id,
-            "transcript": transcript,
-            "auto_approve": auto_approve,
-            "portal_url": portal_url,
-            "reviewer_approved": None,
-        },
-        daemon=True,
+    _submit_reserved_run(
+        _run_workflow_async,
+        run_id=run_id,
+        transcript=transcript,
+        auto_approve=auto_approve,
+        portal_url=portal_url,
+        reviewer_approved=None,
     )
-    worker.start()
     _publish_event(run_id, "run_queued")
 
     return jsonify(record), 202
@@ -554,13 +959,14 @@ def create_run():
 
 @app.route("/api/runs/<run_id>/approve", methods=["POST"])
 def approve_run(run_id: str):
-    with workflow_lock:
-        record = workflow_runs.get(run_id)
-        if record is None:
-            return jsonify({"error": "run_not_found"}), 404
+    state = workflow_runs.get(run_id)
+    if state is None:
+        return jsonify({"error": "run_not_found"}), 404
 
+    with state.lock:
+        record = state.record
         run_status = str(record.get("status", ""))
-        if run_status == "running":
+        if run_status == _RUNNING:
             return jsonify({"error": "run_in_progress"}), 409
 
         result = record.get("result") or {}
@@ -589,31 +995,22 @@ def approve_run(run_id: str):
         portal_url = str((record.get("request") or {}).get("portal_url", "")
                          ).strip() or request.host_url.rstrip("/")
 
-        req = record.setdefault("request", {})
-        req["reviewer_approved"] = True
-
-        record["status"] = "queued"
-        record["error"] = None
-        record["updated_at"] = _utc_now_iso()
-        record["summary"] = _summarize_run(
-            run_id=run_id,
-            result=record.get("result", {}),
-            run_status="queued",
+        if not _reserve_run_slot():
+            return _server_busy_response()
+        response_payload = state.record = _next_record(
+            state,
+            request={**(record.get("request") or {}), "reviewer_approved": True},
+            status=_QUEUED,
             error=None,
         )
-        response_payload = deepcopy(record)
-
-    worker = threading.Thread(
-        target=_run_cached_submission_async,
-        kwargs={
-            "run_id": run_id,
-            "payload": payload,
-            "review_snapshot": review_snapshot,
-            "portal_url": portal_url,
-        },
-        daemon=True,
+
+    _submit_reserved_run(
+        _run_cached_submission_async,
+        run_id=run_id,
+        payload=payload,
+        review_snapshot=review_snapshot,
+        portal_url=portal_url,
     )
-    worker.start()
     _publish_event(run_id, "run_queued")
     return jsonify(response_payload), 202
 
@@ -673,16 +1070,36 @@ def transcribe():
     return jsonify({"error": "Provide audio_b64 (with USE_NOVA_SONIC=1) or mock_transcript"}), 400
 
 
+@app.route("/api/config", methods=["PUT"])
+def update_config():
+    # Disabled unless PA_ADMIN_TOKEN is set; callers send it as a bearer token.
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not PA_ADMIN_TOKEN or not secrets.compare_digest(supplied, PA_ADMIN_TOKEN):
+        return jsonify({"error": "forbidden"}), 403
+    body = request.get_json(silent=True) or {}
+    max_inflight = body.get("max_inflight")
+    if isinstance(max_inflight, bool) or not isinstance(max_inflight, int) or max_inflight < 1:
+        return jsonify({"error": "max_inflight_must_be_positive_int"}), 400
+    _set_inflight_cap(max_inflight)
+    with _admission:
+        active, capacity = _inflight_active, _inflight_cap
+    return jsonify({"max_inflight": capacity, "active_runs": active})
+
+
 @app.route("/health")
 def health():
     with workflow_lock:
-        run_count = len(workflow_run_order)
-        submitted_count = len(submitted_requests)
+        run_count = len(workflow_runs)
+        total_submitted = submitted_count
+    with _admission:
+        active, capacity = _inflight_active, _inflight_cap
     return jsonify(
         {
             "status": "ok",
-            "submitted_count": submitted_count,
+            "submitted_count": total_submitted,
             "workflow_runs_count": run_count,
+            "active_runs": active,
+            "max_inflight": capacity,
         }
     )
 
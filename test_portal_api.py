@@ -1,11 +1,23 @@
 from __future__ import annotations
 
-import os
+import json
+import threading
 import time
 import unittest
 from unittest.mock import patch
 
-from portal.app import TERMINAL_STATUSES, app, workflow_run_order, workflow_runs, workflow_streams
+import portal.app as portal_app
+from agents.types import WorkflowTraceStep
+from portal.app import (
+    TERMINAL_STATUSES,
+    _EventLog,
+    _record_snapshot,
+    _record_trace_step,
+    _summarize_run,
+    app,
+    workflow_runs,
+    workflow_streams,
+)
 
 SAMPLE_TRANSCRIPT = (
     "I need a prior auth for Jane Doe, date of birth March 15 1965, "
@@ -16,41 +28,91 @@ SAMPLE_TRANSCRIPT = (
 
 
 class TestPortalApi(unittest.TestCase):
-    def setUp(self) -> None:
+    @classmethod
+    def setUpClass(cls) -> None:
         app.config["TESTING"] = True
-        self.client = app.test_client()
+        cls._nova_toggles = (portal_app.USE_NOVA_REASONING, portal_app.USE_NOVA_JUSTIFICATION)
+        portal_app.USE_NOVA_REASONING = False
+        portal_app.USE_NOVA_JUSTIFICATION = False
+        cls.client = app.test_client()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        portal_app.USE_NOVA_REASONING, portal_app.USE_NOVA_JUSTIFICATION = cls._nova_toggles
+
+    def setUp(self) -> None:
         workflow_runs.clear()
-        workflow_run_order.clear()
         workflow_streams.clear()
+        # Frequent pings let an abandoned event reader notice it should stop.
+        ping_patch = patch("portal.app.SSE_PING_INTERVAL_S", 0.05)
+        ping_patch.start()
+        self.addCleanup(ping_patch.stop)
 
     def _wait_for_terminal_run(self, run_id: str, timeout_seconds: float = 10.0) -> dict:
+        record = self._wait_for_terminal_event(run_id, time.time() + timeout_seconds)
+        if record is not None:
+            return record
+        # Fallback: poll with exponential backoff if the stream ended without
+        # a terminal record. It gets its own budget, since a stalled stream
+        # may have used up the first one.
         deadline = time.time() + timeout_seconds
+        delay = 0.01
         while time.time() < deadline:
             response = self.client.get(f"/api/runs/{run_id}")
-            if response.status_code != 200:
-                time.sleep(0.05)
-                continue
-            payload = response.get_json() or {}
-            if payload.get("status") in TERMINAL_STATUSES:
-                return payload
-            time.sleep(0.05)
+            if response.status_code == 200:
+                payload = response.get_json() or {}
+                if payload.get("status") in TERMINAL_STATUSES:
+                    return payload
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
         self.fail(f"Run {run_id} did not reach terminal status within {timeout_seconds} seconds.")
 
+    def _wait_for_terminal_event(self, run_id: str, deadline: float) -> dict | None:
+        response = self.client.get(f"/api/runs/{run_id}/events", buffered=False)
+        if response.status_code != 200:
+            return None
+        found: list[dict] = []
+        stop = threading.Event()
+
+        def read_stream() -> None:
+            buffer = b""
+            for chunk in response.response:
+                if stop.is_set():
+                    return
+                buffer += chunk
+                while b"\n\n" in buffer:
+                    frame, buffer = buffer.split(b"\n\n", 1)
+                    for line in frame.split(b"\n"):
+                        if not line.startswith(b"data: "):
+                            continue
+                        record = json.loads(line[len(b"data: "):]).get("record") or {}
+                        if record.get("status") in TERMINAL_STATUSES:
+                            found.append(record)
+                            return
+
+        # Read on a helper thread so a stalled stream cannot hold the test past
+        # its deadline. Once stopped, the reader exits at the next ping, and the
+        # response is closed here (it owns the request context) to end the stream.
+        reader = threading.Thread(target=read_stream, daemon=True)
+        reader.start()
+        reader.join(max(0.0, deadline - time.time()))
+        stop.set()
+        reader.join(timeout=1.0)
+        if reader.is_alive():
+            self.fail(f"Event reader for run {run_id} did not stop.")
+        response.close()
+        return found[0] if found else None
+
     def test_dashboard_page_renders(self) -> None:
         response = self.client.get("/dashboard")
         self.assertEqual(response.status_code, 200)
         self.assertIn(b"PriorAuth Agent Control Room", response.data)
 
     def test_create_and_fetch_workflow_run(self) -> None:
-        with patch.dict(
-            os.environ,
-            {"USE_NOVA_REASONING": "0", "USE_NOVA_JUSTIFICATION": "0"},
-            clear=False,
-        ):
-            create_response = self.client.post(
-                "/api/runs",
-                json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
-            )
+        create_response = self.client.post(
+            "/api/runs",
+            json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
+        )
 
         self.assertEqual(create_response.status_code, 202)
         payload = create_response.get_json()
@@ -63,6 +125,7 @@ class TestPortalApi(unittest.TestCase):
         self.assertEqual(final_payload["status"], "completed")
         self.assertEqual(final_payload["summary"]["next_action"], "human_review_required")
         self.assertEqual(final_payload["summary"]["submission_status"], "needs_approval")
+        self.assertIsInstance(final_payload["summary"]["duration_ms"], int)
 
         detail_payload = self.client.get(f"/api/runs/{run_id}").get_json() or {}
         self.assertEqual(detail_payload["id"], run_id)
@@ -72,18 +135,17 @@ class TestPortalApi(unittest.TestCase):
         list_payload = list_response.get_json()
         self.assertIsNotNone(list_payload)
         assert list_payload is not None
+        self.assertEqual(list_payload["runs"][0], detail_payload["summary"])
+        # Same key order as the jsonify endpoints (sorted).
+        self.assertEqual(list(list_payload), ["count", "runs"])
+        self.assertEqual(list(list_payload["runs"][0]), sorted(list_payload["runs"][0]))
         self.assertGreaterEqual(list_payload["count"], 1)
 
     def test_events_endpoint_streams_snapshot(self) -> None:
-        with patch.dict(
-            os.environ,
-            {"USE_NOVA_REASONING": "0", "USE_NOVA_JUSTIFICATION": "0"},
-            clear=False,
-        ):
-            create_response = self.client.post(
-                "/api/runs",
-                json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
-            )
+        create_response = self.client.post(
+            "/api/runs",
+            json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
+        )
 
         run_id = (create_response.get_json() or {})["id"]
         response = self.client.get(f"/api/runs/{run_id}/events", buffered=False)
@@ -92,16 +154,190 @@ class TestPortalApi(unittest.TestCase):
         self.assertIn("event: snapshot", first_chunk)
         response.close()
 
-    def test_approve_endpoint_requeues_waiting_run(self) -> None:
-        with patch.dict(
-            os.environ,
-            {"USE_NOVA_REASONING": "0", "USE_NOVA_JUSTIFICATION": "0"},
-            clear=False,
-        ):
-            create_response = self.client.post(
-                "/api/runs",
-                json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
+    def test_events_for_finished_run_skip_listener_registration(self) -> None:
+        with patch("portal.app._execute_workflow", return_value={"trace": []}):
+            run_id = (self.client.post("/api/runs", json={}).get_json() or {})["id"]
+            self._wait_for_terminal_run(run_id)
+
+        response = self.client.get(f"/api/runs/{run_id}/events")
+        body = response.get_data()
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertIn(b"event: snapshot", body)
+        self.assertIn(b"event: terminal", body)
+        self.assertNotIn(run_id, workflow_streams)
+
+    def test_trace_events_stream_batched_new_steps(self) -> None:
+        release = threading.Event()
+
+        def fake_execute_workflow(**kwargs) -> dict:
+            release.wait(timeout=5)
+            for step in ("Voice Intake", "Clinical Coding"):
+                kwargs["trace_hook"](
+                    WorkflowTraceStep(step=step, status="completed", detail="ok")
+                )
+            return {"trace": [], "next_action": "human_review_required"}
+
+        with patch("portal.app._execute_workflow", side_effect=fake_execute_workflow):
+            run_id = (self.client.post("/api/runs", json={}).get_json() or {})["id"]
+            response = self.client.get(f"/api/runs/{run_id}/events", buffered=False)
+            frames = iter(response.response)
+            self.assertIn(b"event: snapshot", next(frames))
+            release.set()
+
+            trace_frame = next(
+                frame for frame in frames if frame.startswith(b"event: trace_batch")
+            )
+            response.close()
+            self._wait_for_terminal_run(run_id)
+
+        payload = json.loads(trace_frame.split(b"data: ", 1)[1])
+        self.assertNotIn("record", payload)
+        self.assertEqual(payload["record_id"], run_id)
+        self.assertEqual(
+            [step["step"] for step in payload["steps"]], ["Voice Intake", "Clinical Coding"]
+        )
+        self.assertEqual(payload["summary"]["trace_steps"], 2)
+
+    def test_published_snapshots_are_not_mutated_by_later_steps(self) -> None:
+        release = threading.Event()
+
+        def fake_execute_workflow(**kwargs) -> dict:
+            release.wait(timeout=5)
+            return {"trace": [], "next_action": "human_review_required"}
+
+        with patch("portal.app._execute_workflow", side_effect=fake_execute_workflow):
+            run_id = (self.client.post("/api/runs", json={}).get_json() or {})["id"]
+            before = _record_snapshot(run_id)
+            _record_trace_step(
+                run_id, WorkflowTraceStep(step="Voice Intake", status="completed", detail="ok")
             )
+            after = _record_snapshot(run_id)
+            release.set()
+            self._wait_for_terminal_run(run_id)
+
+        assert before is not None and after is not None
+        self.assertEqual(len(before["result"]["trace"]), 0)
+        self.assertEqual(before["summary"]["trace_steps"], 0)
+        self.assertEqual(len(after["result"]["trace"]), 1)
+        self.assertEqual(after["summary"]["trace_steps"], 1)
+
+    def test_trace_steps_patch_summary_to_match_full_rebuild(self) -> None:
+        release = threading.Event()
+
+        def fake_execute_workflow(**kwargs) -> dict:
+            release.wait(timeout=5)
+            return {"trace": [], "next_action": "human_review_required"}
+
+        with patch("portal.app._execute_workflow", side_effect=fake_execute_workflow):
+            run_id = (self.client.post("/api/runs", json={}).get_json() or {})["id"]
+            for step in ("Voice Intake", "Policy Retrieval"):
+                _record_trace_step(
+                    run_id, WorkflowTraceStep(step=step, status="completed", detail="ok")
+                )
+            record = _record_snapshot(run_id)
+            release.set()
+            self._wait_for_terminal_run(run_id)
+
+        assert record is not None
+        summary = record["summary"]
+        self.assertEqual(summary["trace_steps"], 2)
+        self.assertIsInstance(summary["duration_ms"], int)
+        rebuilt = _summarize_run(
+            run_id=run_id,
+            result=record["result"],
+            run_status=record["status"],
+            error=record["error"],
+        )
+        self.assertEqual(
+            {key: value for key, value in summary.items() if key != "duration_ms"},
+            {key: value for key, value in rebuilt.items() if key != "duration_ms"},
+        )
+
+    def test_event_log_reports_events_dropped_past_its_size(self) -> None:
+        with patch("portal.app.SSE_EVENT_LOG_SIZE", 2):
+            log = _EventLog()
+        for index in range(5):
+            log.append("trace", str(index).encode())
+
+        dropped, events, last_seen = log.read_after(0, timeout=0)
+        self.assertEqual(dropped, 3)
+        self.assertEqual([body for _, body in events], [b"3", b"4"])
+        self.assertEqual(log.read_after(last_seen, timeout=0), (0, [], last_seen))
+
+        # A second subscriber that is caught up reads the same shared entries.
+        log.append("terminal", b"5")
+        self.assertEqual(log.read_after(4, timeout=0), (0, [("trace", b"4"), ("terminal", b"5")], 6))
+
+    def test_create_run_returns_503_when_run_queue_is_full(self) -> None:
+        with patch("portal.app.PA_MAX_QUEUED", 0):
+            response = self.client.post("/api/runs", json={"transcript": SAMPLE_TRANSCRIPT})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers.get("Retry-After"), "1")
+        self.assertEqual((response.get_json() or {}).get("error"), "server_busy")
+        self.assertEqual(len(workflow_runs), 0)
+
+    def test_config_endpoint_resizes_inflight_limit(self) -> None:
+        original = self.client.get("/health").get_json()["max_inflight"]
+        self.assertLessEqual(original, portal_app.PA_WORKERS)
+        headers = {"Authorization": "Bearer test-admin-token"}
+        with patch("portal.app.PA_ADMIN_TOKEN", "test-admin-token"):
+            try:
+                unauthorized = self.client.put("/api/config", json={"max_inflight": 3})
+                self.assertEqual(unauthorized.status_code, 403)
+
+                response = self.client.put("/api/config", json={"max_inflight": 3}, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual((response.get_json() or {}).get("max_inflight"), 3)
+
+                health = self.client.get("/health").get_json() or {}
+                self.assertEqual(health["max_inflight"], 3)
+                self.assertGreaterEqual(health["active_runs"], 0)
+
+                clamped = self.client.put(
+                    "/api/config", json={"max_inflight": portal_app.PA_WORKERS + 1}, headers=headers
+                )
+                self.assertEqual((clamped.get_json() or {}).get("max_inflight"), portal_app.PA_WORKERS)
+
+                rejected = self.client.put("/api/config", json={"max_inflight": 0}, headers=headers)
+                self.assertEqual(rejected.status_code, 400)
+            finally:
+                self.client.put("/api/config", json={"max_inflight": original}, headers=headers)
+
+    def test_runs_over_the_inflight_cap_wait_outside_the_pool(self) -> None:
+        release = threading.Event()
+        started: list[int] = []
+
+        def blocking_run(index: int) -> None:
+            started.append(index)
+            release.wait(timeout=5)
+
+        original = portal_app._inflight_cap
+        portal_app._set_inflight_cap(1)
+        try:
+            for index in range(3):
+                self.assertTrue(portal_app._reserve_run_slot())
+                portal_app._submit_reserved_run(blocking_run, index=index)
+            deadline = time.time() + 5
+            while not started and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            # Only the admitted run holds a worker; the others wait in the admission queue.
+            self.assertEqual(started, [0])
+            self.assertEqual(len(portal_app._pending_runs), 2)
+        finally:
+            release.set()
+            portal_app._set_inflight_cap(original)
+        deadline = time.time() + 5
+        while len(started) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sorted(started), [0, 1, 2])
+
+    def test_approve_endpoint_requeues_waiting_run(self) -> None:
+        create_response = self.client.post(
+            "/api/runs",
+            json={"transcript": SAMPLE_TRANSCRIPT, "auto_approve": False},
+        )
 
         self.assertEqual(create_response.status_code, 202)
         run_id = (create_response.get_json() or {})["id"]
@@ -113,6 +349,9 @@ class TestPortalApi(unittest.TestCase):
             1 for step in initial_trace if step.get("step") == "Voice Intake"
         )
 
+        # Simulate a minute-long human review pause before approval.
+        workflow_runs[run_id].start_ns -= 60_000_000_000
+
         approve_response = self.client.post(f"/api/runs/{run_id}/approve", json={})
         self.assertEqual(approve_response.status_code, 202)
         approve_payload = approve_response.get_json() or {}
@@ -121,6 +360,8 @@ class TestPortalApi(unittest.TestCase):
         approved_final = self._wait_for_terminal_run(run_id)
         self.assertIn(approved_final["summary"]["submission_status"], {"submitted", "failed"})
         self.assertTrue((approved_final.get("request") or {}).get("reviewer_approved"))
+        # Duration spans the whole run, review pause included, like trace_steps.
+        self.assertGreaterEqual(approved_final["summary"]["duration_ms"], 60_000)
         approved_trace = (approved_final.get("result") or {}).get("trace") or []
         approved_voice_intake_count = sum(
             1 for step in approved_trace if step.get("step") == "Voice Intake"
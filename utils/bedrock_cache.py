@@ -0,0 +1,87 @@
+"""
+Exact-match response cache for Nova Converse calls.
+
+Deterministic calls (temperature 0) with an identical request body return the
+same answer, so repeat transcripts can skip bedrock-runtime entirely. Keys are
+the canonical JSON of the request; entries expire after NOVA_CACHE_TTL_SECONDS
+and the least recently used entry is evicted past NOVA_CACHE_MAX_ENTRIES.
+Set NOVA_CACHE_MAX_ENTRIES=0 to disable caching.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, TypeVar
+
+ConverseCall = TypeVar("ConverseCall", bound=Callable[..., dict[str, Any]])
+
+
+class NovaResponseCache:
+    """Thread-safe LRU with a per-entry TTL. Cached responses must be treated as read-only."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: str, response: dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = NovaResponseCache(
+    max_entries=int(os.getenv("NOVA_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("NOVA_CACHE_TTL_SECONDS", "3600")),
+)
+
+
+def request_key(request: dict[str, Any]) -> str:
+    return json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def cached_nova_call(call: ConverseCall) -> ConverseCall:
+    """
+    Cache a ``call(client, **request)`` Converse wrapper on its request body.
+
+    The client is not part of the key: every runtime client in a process talks
+    to the same models, and failed calls raise before anything is stored.
+    """
+
+    @functools.wraps(call)
+    def wrapper(client: Any, **request: Any) -> dict[str, Any]:
+        key = request_key(request)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        response = call(client, **request)
+        response_cache.put(key, response)
+        return response
+
+    return wrapper  # type: ignore[return-value]
@@ -1,43 +1,84 @@
-import boto3
+"""
+Shared boto3 client factories for Bedrock.
+
+This is the only copy of these factories; agents import from here so they all
+share the per-region client cache. Nothing is loaded from .env at import time.
+"""
+
+from __future__ import annotations
+
+import functools
 import os
+from typing import Any
+
+import boto3
 from botocore.config import Config
 
+# Built once and shared by the cached clients. The pool is sized for several
+# concurrent portal runs (botocore defaults to 10), and adaptive retries back
+# off client-side on throttling instead of holding pooled connections.
+_POOL_CONNECTIONS = 32
+_RUNTIME_CONFIG = Config(
+    read_timeout=3600,   # long timeout needed for Nova Act and extended thinking
+    connect_timeout=30,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    max_pool_connections=_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+)
+_AGENT_CONFIG = Config(
+    retries={"mode": "adaptive", "max_attempts": 3},
+    max_pool_connections=_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+)
+
+
+# Opt-in Bedrock prompt caching: a cachePoint after each static system prompt.
+PROMPT_CACHING = os.getenv("NOVA_PROMPT_CACHING", "0").lower() in {"1", "true", "yes"}
+
 
-def get_bedrock_client():
+def system_blocks(system_prompt: str) -> list[dict[str, Any]]:
+    """
+    Returns Converse ``system`` content for a static system prompt.
+    With NOVA_PROMPT_CACHING=1 a cachePoint marks the end of the system prompt
+    so Bedrock can reuse that prefix across calls; user messages stay uncached.
+    """
+    blocks: list[dict[str, Any]] = [{"text": system_prompt}]
+    if PROMPT_CACHING:
+        blocks.append({"cachePoint": {"type": "default"}})
+    return blocks
+
+
+def _resolve_region(region: str | None) -> str:
+    return region or os.getenv("AWS_REGION", "us-east-1")
+
+
+def get_bedrock_client(region: str | None = None):
     """
     Returns a configured Bedrock runtime client for model invocation.
     Credentials are resolved automatically from ~/.aws/credentials
     via the boto3 credential chain - no .env file or hardcoded keys needed.
+    Clients are thread-safe and cached per region, so this is cheap to call.
     """
-    return boto3.client(
-        "bedrock-runtime",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-        config=Config(
-            read_timeout=3600,   # long timeout needed for Nova Act and extended thinking
-            connect_timeout=30,
-            retries={"max_attempts": 3},
-        ),
-    )
+    return _cached_client("bedrock-runtime", _resolve_region(region), _RUNTIME_CONFIG)
 
 
-def get_bedrock_agent_client():
+def get_bedrock_agent_client(region: str | None = None):
     """
     Returns a Bedrock agent client for Knowledge Base management.
     This is a different boto3 service from bedrock-runtime - runtime is for
     invoking models, agent is for managing and querying Knowledge Bases.
     """
-    return boto3.client(
-        "bedrock-agent",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+    return _cached_client("bedrock-agent", _resolve_region(region), _AGENT_CONFIG)
 
 
-def get_bedrock_agent_runtime_client():
+def get_bedrock_agent_runtime_client(region: str | None = None):
     """
     Returns a Bedrock agent runtime client for querying Knowledge Bases.
     Used by the retrieval agent to perform RAG queries against the KB.
     """
-    return boto3.client(
-        "bedrock-agent-runtime",
-        region_name=os.getenv("AWS_REGION", "us-east-1"),
-    )
+    return _cached_client("bedrock-agent-runtime", _resolve_region(region), _AGENT_CONFIG)
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_client(service_name: str, region: str, config: Config | None = None):
+    return boto3.client(service_name, region_name=region, config=config)